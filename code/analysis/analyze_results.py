@@ -1,44 +1,52 @@
 #!/usr/bin/env python3
 """Analyze the quality of extracted content"""
 
-import pandas as pd
-import re
+from utils import read_csv
 
-# Load the CSV
-df = pd.read_csv('extracted_content/video_content_analysis.csv')
+# Load only the columns this report reads
+USECOLS = ['filename', 'processing_status', 'on_screen_text', 'spoken_phrases']
+DTYPES = {'processing_status': 'category'}
 
-print(f"Total videos processed: {len(df)}")
-print(f"Successful: {len(df[df['processing_status'] == 'success'])}")
-print(f"Partial: {len(df[df['processing_status'] == 'partial'])}")
-print(f"Failed: {len(df[df['processing_status'] == 'failed'])}")
+df = read_csv('extracted_content/video_content_analysis.csv', usecols=USECOLS, dtype=DTYPES)
+
+total_videos = len(df)
+status_counts = df['processing_status'].value_counts()
+
+print(f"Total videos processed: {total_videos}")
+print(f"Successful: {status_counts.get('success', 0)}")
+print(f"Partial: {status_counts.get('partial', 0)}")
+print(f"Failed: {status_counts.get('failed', 0)}")
 
 # Analyze text quality
-def has_readable_text(text):
-    if pd.isna(text) or text == '':
-        return False
-    # Check if text has at least 3 consecutive readable words
-    words = re.findall(r'\b[a-zA-Z]{3,}\b', str(text))
-    return len(words) >= 3
+READABLE_WORD_PATTERN = r'\b[a-zA-Z]{3,}\b'
+
+def count_readable_words(column):
+    """Count words of 3+ letters per row in a single vectorized pass"""
+    return column.fillna('').astype(str).str.count(READABLE_WORD_PATTERN)
 
-# Check OCR quality
-ocr_readable = df['on_screen_text'].apply(has_readable_text)
-print(f"\nVideos with readable OCR text: {ocr_readable.sum()} ({ocr_readable.sum()/len(df)*100:.1f}%)")
+# Check OCR quality (text needs at least 3 readable words)
+ocr_readable = count_readable_words(df['on_screen_text']) >= 3
+ocr_count = ocr_readable.sum()
+print(f"\nVideos with readable OCR text: {ocr_count} ({ocr_count/total_videos*100:.1f}%)")
 
 # Check audio transcription quality  
-audio_readable = df['spoken_phrases'].apply(has_readable_text)
-print(f"Videos with readable audio transcription: {audio_readable.sum()} ({audio_readable.sum()/len(df)*100:.1f}%)")
+audio_readable = count_readable_words(df['spoken_phrases']) >= 3
+audio_count = audio_readable.sum()
+print(f"Videos with readable audio transcription: {audio_count} ({audio_count/total_videos*100:.1f}%)")
 
 # Find best examples
 readable_mask = ocr_readable | audio_readable
-if readable_mask.sum() > 0:
-    print(f"\nTotal videos with ANY readable content: {readable_mask.sum()} ({readable_mask.sum()/len(df)*100:.1f}%)")
+readable_count = readable_mask.sum()
+if readable_count > 0:
+    print(f"\nTotal videos with ANY readable content: {readable_count} ({readable_count/total_videos*100:.1f}%)")
     
     # Show some examples
     print("\n=== Sample of videos with readable content ===")
-    readable_df = df[readable_mask].head(5)
-    for idx, row in readable_df.iterrows():
-        print(f"\nVideo: {row['filename']}")
-        if has_readable_text(row['on_screen_text']):
-            print(f"OCR: {row['on_screen_text'][:100]}...")
-        if has_readable_text(row['spoken_phrases']):
-            print(f"Audio: {row['spoken_phrases'][:100]}...")
\ No newline at end of file
+    # Only pull the rows we print instead of copying every readable row
+    readable_df = df.loc[readable_mask[readable_mask].index[:5]]
+    for row in readable_df.itertuples():
+        print(f"\nVideo: {row.filename}")
+        if ocr_readable[row.Index]:
+            print(f"OCR: {row.on_screen_text[:100]}...")
+        if audio_readable[row.Index]:
+            print(f"Audio: {row.spoken_phrases[:100]}...")
\ No newline at end of file
@@ -3,180 +3,184 @@
 Analyze creators and export creator database with performance metrics
 """
 import os
-import json
-import csv
-from collections import defaultdict
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils import iter_json_list, query_from_filename
 
 # Directories
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 APIFY_DIR = os.path.join(BASE_DIR, "apify_downloads")
 OUTPUT_DIR = os.path.join(BASE_DIR, "exports")
 
+def process_file(json_path):
+    """Parse one Apify file into per-video creator records, returning (records, error)"""
+    records = []
+    try:
+        for video_data in iter_json_list(json_path):
+            author_meta = video_data.get('authorMeta', {})
+            username = author_meta.get('name', '')
+            
+            if username:
+                # Null counts are treated as zero rather than failing the whole file
+                records.append((
+                    username,
+                    (author_meta.get('fans', 0) or 0,
+                     author_meta.get('verified', False),
+                     author_meta.get('signature', ''),
+                     author_meta.get('nickName', '')),
+                    video_data.get('playCount', 0) or 0,
+                    video_data.get('diggCount', 0) or 0,
+                    video_data.get('commentCount', 0) or 0,
+                    video_data.get('shareCount', 0) or 0,
+                    video_data.get('text', '')[:100]
+                ))
+    except ValueError as e:  # Malformed JSON - the file contributes no records, streamed or not
+        return [], e
+    except Exception as e:
+        return records, e
+    return records, None
+
 def main():
     print("👥 Analyzing creators...")
     
-    creators = defaultdict(lambda: {
-        'videos': [],
-        'total_views': 0,
-        'total_likes': 0,
-        'total_comments': 0,
-        'total_shares': 0,
-        'followers': 0,
-        'verified': False,
-        'bio': '',
-        'nickname': ''
-    })
-    
-    # Process all JSON files
-    json_files = [f for f in os.listdir(APIFY_DIR) if f.endswith('.json') and f.startswith('tiktok_')]
-    
-    for json_file in sorted(json_files):
-        search_query = json_file[7:]
-        search_query = '_'.join(search_query.split('_')[:-2])
-        
-        json_path = os.path.join(APIFY_DIR, json_file)
-        try:
-            with open(json_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+    # One date stamp for every report file, even if the run crosses midnight
+    run_date = datetime.now().strftime("%Y%m%d")
+    
+    # Latest (followers, verified, bio, nickname) per creator; a plain dict assignment
+    # keeps first-seen order without building a default entry per new creator
+    creator_info = {}
+    # Per-video fields are kept as flat columns (structure of arrays) rather than a dict per video
+    video_creators = []
+    video_views = []
+    video_engagement = []
+    video_captions = []
+    video_queries = []
+    
+    # Process all JSON files - parsing runs in worker processes,
+    # aggregation stays here and consumes files in sorted order
+    with os.scandir(APIFY_DIR) as entries:
+        json_entries = sorted((entry.name, entry.path) for entry in entries
+                              if entry.name.startswith('tiktok_') and entry.name.endswith('.json') and entry.is_file())
+    json_files = [name for name, _ in json_entries]
+    json_paths = [path for _, path in json_entries]
+    
+    with ProcessPoolExecutor() as executor:
+        results = executor.map(process_file, json_paths, chunksize=8)
+        for json_file, (records, error) in zip(json_files, results):
+            search_query = query_from_filename(json_file)
             
-            if isinstance(data, list):
-                for video_data in data:
-                    author_meta = video_data.get('authorMeta', {})
-                    username = author_meta.get('name', '')
-                    
-                    if username:
-                        creator = creators[username]
-                        
-                        # Update creator info
-                        creator['followers'] = author_meta.get('fans', 0)
-                        creator['verified'] = author_meta.get('verified', False)
-                        creator['bio'] = author_meta.get('signature', '')
-                        creator['nickname'] = author_meta.get('nickName', '')
-                        
-                        # Add video stats
-                        views = video_data.get('playCount', 0)
-                        likes = video_data.get('diggCount', 0)
-                        comments = video_data.get('commentCount', 0)
-                        shares = video_data.get('shareCount', 0)
-                        
-                        creator['total_views'] += views
-                        creator['total_likes'] += likes
-                        creator['total_comments'] += comments
-                        creator['total_shares'] += shares
-                        
-                        creator['videos'].append({
-                            'id': video_data.get('id', ''),
-                            'views': views,
-                            'engagement': likes + comments + shares,
-                            'caption': video_data.get('text', '')[:100],
-                            'search_query': search_query
-                        })
-        
-        except Exception as e:
-            print(f"⚠️  Error processing {json_file}: {e}")
-    
-    # Calculate metrics for each creator
-    creator_stats = []
-    for username, data in creators.items():
-        video_count = len(data['videos'])
-        if video_count > 0:
-            avg_views = data['total_views'] / video_count
-            avg_engagement = (data['total_likes'] + data['total_comments'] + data['total_shares']) / video_count
-            engagement_rate = ((data['total_likes'] + data['total_comments'] + data['total_shares']) / 
-                             data['total_views'] * 100) if data['total_views'] > 0 else 0
+            for username, author_info, views, likes, comments, shares, caption in records:
+                # Update creator info
+                creator_info[username] = author_info
+                
+                # Video stats are summed per creator after ingest
+                video_creators.append(username)
+                video_views.append(views)
+                video_engagement.append(likes + comments + shares)
+                video_captions.append(caption)
+                video_queries.append(search_query)
             
-            # Find most popular video
-            best_video = max(data['videos'], key=lambda x: x['engagement']) if data['videos'] else None
-            
-            creator_stats.append({
-                'username': username,
-                'nickname': data['nickname'],
-                'followers': data['followers'],
-                'verified': data['verified'],
-                'bio': data['bio'][:200],  # First 200 chars
-                'video_count': video_count,
-                'total_views': data['total_views'],
-                'total_engagement': data['total_likes'] + data['total_comments'] + data['total_shares'],
-                'avg_views': avg_views,
-                'avg_engagement': avg_engagement,
-                'engagement_rate': engagement_rate,
-                'best_video_caption': best_video['caption'] if best_video else '',
-                'best_video_views': best_video['views'] if best_video else 0,
-                'search_queries': ', '.join(set(v['search_query'] for v in data['videos']))
-            })
-    
-    # 1. All creators database
-    print("\n📊 Full Creator Database")
-    all_creators_file = os.path.join(OUTPUT_DIR, f'creator_database_{datetime.now().strftime("%Y%m%d")}.csv')
+            if error is not None:
+                print(f"⚠️  Error processing {json_file}: {error}")
+    
+    videos_df = pd.DataFrame({
+        'username': video_creators,
+        'views': video_views,
+        'engagement': video_engagement,
+        'caption': video_captions,
+        'search_query': video_queries
+    })
+    
+    # Per-creator video stats from the video columns in one grouped pass; every creator
+    # has at least one video. idxmax keeps the first of equally engaging videos, as max() did
+    by_creator = videos_df.groupby('username', sort=False)
+    creator_totals = by_creator.agg(
+        video_count=('views', 'size'),
+        total_views=('views', 'sum'),
+        total_engagement=('engagement', 'sum')
+    )
+    best_videos = videos_df.loc[by_creator['engagement'].idxmax()].set_index('username')
+    creator_queries = (videos_df.drop_duplicates(['username', 'search_query'])
+                       .groupby('username', sort=False)['search_query'].agg(', '.join))
     
     fieldnames = ['username', 'nickname', 'followers', 'verified', 'video_count', 
                   'total_views', 'total_engagement', 'avg_views', 'avg_engagement', 
                   'engagement_rate', 'bio', 'search_queries']
-    
-    with open(all_creators_file, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for creator in sorted(creator_stats, key=lambda x: x['followers'], reverse=True):
-            writer.writerow({k: creator[k] for k in fieldnames})
+    fieldnames_engagement = ['username', 'followers', 'video_count', 
+                             'engagement_rate', 'avg_views', 'avg_engagement', 'best_video_caption']
+    
+    # One frame for all reports, in first-seen creator order; stable descending sorts keep that order for ties
+    creators_df = pd.DataFrame.from_dict(
+        creator_info, orient='index',
+        columns=['followers', 'verified', 'bio', 'nickname']
+    ).join(creator_totals)
+    creators_df['bio'] = creators_df['bio'].str[:200]  # First 200 chars
+    creators_df['best_video_caption'] = best_videos['caption']
+    creators_df['best_video_views'] = best_videos['views']
+    creators_df['search_queries'] = creator_queries
+    creators_df = creators_df.rename_axis('username').reset_index()
+    
+    # Per-creator averages and engagement rate, computed column-wise over the totals
+    total_views = creators_df['total_views'].to_numpy(dtype=np.float64)
+    total_engagement = creators_df['total_engagement'].to_numpy(dtype=np.float64)
+    video_count = creators_df['video_count'].to_numpy(dtype=np.float64)
+    creators_df['avg_views'] = total_views / video_count
+    creators_df['avg_engagement'] = total_engagement / video_count
+    with np.errstate(divide='ignore', invalid='ignore'):
+        creators_df['engagement_rate'] = np.where(total_views > 0, total_engagement / total_views * 100, 0)
+    
+    by_followers = creators_df.sort_values('followers', ascending=False, kind='stable')
+    
+    # 1. All creators database - CRLF rows, as csv.DictWriter wrote them
+    print("\n📊 Full Creator Database")
+    all_creators_file = os.path.join(OUTPUT_DIR, f'creator_database_{run_date}.csv')
+    by_followers.to_csv(all_creators_file, columns=fieldnames, index=False, encoding='utf-8', lineterminator='\r\n')
     
     print(f"✅ Saved: {all_creators_file}")
     
     # 2. Top 100 creators by followers
     print("\n👑 Top Creators by Followers")
-    top_creators = sorted(creator_stats, key=lambda x: x['followers'], reverse=True)[:100]
+    top_creators = by_followers.head(100).reset_index(drop=True)
+    top_creators.index += 1
     
-    top_file = os.path.join(OUTPUT_DIR, f'top_100_creators_{datetime.now().strftime("%Y%m%d")}.csv')
-    
-    with open(top_file, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=['rank'] + fieldnames)
-        writer.writeheader()
-        for i, creator in enumerate(top_creators, 1):
-            row = {'rank': i}
-            row.update({k: creator[k] for k in fieldnames})
-            writer.writerow(row)
+    top_file = os.path.join(OUTPUT_DIR, f'top_100_creators_{run_date}.csv')
+    top_creators.to_csv(top_file, columns=fieldnames, index_label='rank', encoding='utf-8', lineterminator='\r\n')
     
     print(f"✅ Saved: {top_file}")
     
     # 3. High engagement creators (min 5 videos)
     print("\n⭐ High Engagement Creators")
-    high_engagement = sorted(
-        [c for c in creator_stats if c['video_count'] >= 5],
-        key=lambda x: x['engagement_rate'],
-        reverse=True
-    )[:50]
-    
-    engagement_file = os.path.join(OUTPUT_DIR, f'high_engagement_creators_{datetime.now().strftime("%Y%m%d")}.csv')
-    
-    fieldnames_engagement = ['rank', 'username', 'followers', 'video_count', 
-                           'engagement_rate', 'avg_views', 'avg_engagement', 'best_video_caption']
+    high_engagement = (creators_df[creators_df['video_count'] >= 5]
+                       .nlargest(50, 'engagement_rate', keep='first')
+                       .reset_index(drop=True))
+    high_engagement.index += 1
     
-    with open(engagement_file, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames_engagement)
-        writer.writeheader()
-        for i, creator in enumerate(high_engagement, 1):
-            row = {'rank': i}
-            row.update({k: creator[k] for k in fieldnames_engagement[1:]})
-            writer.writerow(row)
+    engagement_file = os.path.join(OUTPUT_DIR, f'high_engagement_creators_{run_date}.csv')
+    high_engagement.to_csv(engagement_file, columns=fieldnames_engagement, index_label='rank', encoding='utf-8',
+                           lineterminator='\r\n')
     
     print(f"✅ Saved: {engagement_file}")
     
     # Print summary
     print("\n📈 Creator Summary:")
-    print(f"   Total unique creators: {len(creators):,}")
-    print(f"   Verified creators: {len([c for c in creator_stats if c['verified']]):,}")
-    print(f"   Creators with 1M+ followers: {len([c for c in creator_stats if c['followers'] >= 1000000]):,}")
-    print(f"   Creators with 100k+ followers: {len([c for c in creator_stats if c['followers'] >= 100000]):,}")
+    print(f"   Total unique creators: {len(creator_info):,}")
+    print(f"   Verified creators: {creators_df['verified'].astype(bool).sum():,}")
+    print(f"   Creators with 1M+ followers: {(creators_df['followers'] >= 1000000).sum():,}")
+    print(f"   Creators with 100k+ followers: {(creators_df['followers'] >= 100000).sum():,}")
     
     print("\n👑 Top 5 Creators by Followers:")
-    for i, creator in enumerate(top_creators[:5], 1):
-        print(f"   {i}. @{creator['username']} ({creator['followers']:,} followers, "
-              f"{creator['video_count']} videos)")
+    for i, creator in enumerate(top_creators.head(5).itertuples(index=False), 1):
+        print(f"   {i}. @{creator.username} ({creator.followers:,} followers, "
+              f"{creator.video_count} videos)")
     
     print("\n⭐ Top 5 by Engagement Rate (min 5 videos):")
-    for i, creator in enumerate(high_engagement[:5], 1):
-        print(f"   {i}. @{creator['username']} ({creator['engagement_rate']:.1f}% engagement, "
-              f"{creator['followers']:,} followers)")
+    for i, creator in enumerate(high_engagement.head(5).itertuples(index=False), 1):
+        print(f"   {i}. @{creator.username} ({creator.engagement_rate:.1f}% engagement, "
+              f"{creator.followers:,} followers)")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -6,11 +6,15 @@ import requests
 import json
 import os
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # ===== STEP 1: Add your Apify API key here =====
 # You can find this at: https://console.apify.com/account/integrations
 APIFY_API_KEY = "YOUR_API_KEY_HERE"  # Replace with your actual API key
 
+# Datasets are independent downloads, so fetch a few at once
+MAX_DOWNLOAD_WORKERS = 6
+
 # Create a folder for downloaded data
 output_folder = "apify_downloads"
 if not os.path.exists(output_folder):
@@ -63,10 +67,28 @@ if __name__ == "__main__":
 
     if datasets:
         print(f"📊 Found {len(datasets.get('data', []))} datasets")
-        for dataset in datasets.get('data', []):
-            dataset_id = dataset.get('defaultDatasetId')
-            search_query = dataset.get('buildId', 'unknown')
-            if dataset_id:
-                download_dataset(dataset_id, search_query)
+        with ThreadPoolExecutor(max_workers=MAX_DOWNLOAD_WORKERS) as executor:
+            futures = {}
+            for dataset in datasets.get('data', []):
+                dataset_id = dataset.get('defaultDatasetId')
+                search_query = dataset.get('buildId', 'unknown')
+                if dataset_id:
+                    futures[executor.submit(download_dataset, dataset_id, search_query)] = dataset_id
+            
+            # Collect every result so errors outside RequestException (bad JSON, failed writes) still surface
+            failed = 0
+            unexpected = 0
+            for future in as_completed(futures):
+                try:
+                    if not future.result():
+                        failed += 1
+                except Exception as e:
+                    print(f"❌ Error downloading {futures[future]}: {e}")
+                    failed += 1
+                    unexpected += 1
+        
+        print(f"📥 Downloaded {len(futures) - failed} of {len(futures)} datasets ({failed} failed)")
+        if unexpected:
+            exit(1)
     else:
         print("❌ Failed to fetch datasets")
\ No newline at end of file
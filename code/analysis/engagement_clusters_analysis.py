@@ -5,18 +5,25 @@ Deep dive into engagement rate distributions and natural clusters
 import pandas as pd
 import numpy as np
 import os
+import re
+
+from utils import read_csv
 
 # Load the refined dataset
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 EXPORTS_DIR = os.path.join(BASE_DIR, "exports")
 
+USECOLS = ['engagement_rate', 'search_query', 'creator_username']
+DTYPES = {'search_query': 'category', 'creator_username': 'category'}
+
 print("📊 Engagement Rate Clusters & Distribution Analysis")
-df = pd.read_csv(os.path.join(EXPORTS_DIR, 'tiktok_videos_refined_20250803.csv'))
+df = read_csv(os.path.join(EXPORTS_DIR, 'tiktok_videos_refined_20250803.csv'), usecols=USECOLS, dtype=DTYPES)
 
+overall = df['engagement_rate'].agg(['mean', 'median', 'std'])
 print(f"📈 Overall Engagement Distribution:")
-print(f"   Mean: {df['engagement_rate'].mean():.2f}%")
-print(f"   Median: {df['engagement_rate'].median():.2f}%")
-print(f"   Standard Deviation: {df['engagement_rate'].std():.2f}%")
+print(f"   Mean: {overall['mean']:.2f}%")
+print(f"   Median: {overall['median']:.2f}%")
+print(f"   Standard Deviation: {overall['std']:.2f}%")
 
 # Define natural clusters based on performance levels
 clusters = {
@@ -27,44 +34,53 @@ clusters = {
     'Exceptional Performance': (15, 100)
 }
 
+# Clusters are contiguous [min, max) ranges, so one binning pass counts them all
+cluster_edges = [min_val for min_val, _ in clusters.values()] + [max(max_val for _, max_val in clusters.values())]
+# labels=False gives plain integer bin codes (NaN outside the edges) instead of a Categorical
+cluster_names = list(clusters)
+cluster_codes = pd.cut(df['engagement_rate'], bins=cluster_edges, labels=False, right=False)
+cluster_counts = pd.Series(
+    np.bincount(cluster_codes.dropna().astype(np.intp), minlength=len(cluster_names)),
+    index=cluster_names
+)
+
 print(f"\n🎯 Natural Performance Clusters:")
 for cluster_name, (min_val, max_val) in clusters.items():
-    cluster_data = df[(df['engagement_rate'] >= min_val) & (df['engagement_rate'] < max_val)]
-    percentage = (len(cluster_data) / len(df)) * 100
-    print(f"   {cluster_name} ({min_val}-{max_val}%): {len(cluster_data):,} videos ({percentage:.1f}%)")
+    cluster_size = cluster_counts[cluster_name]
+    percentage = (cluster_size / len(df)) * 100
+    print(f"   {cluster_name} ({min_val}-{max_val}%): {cluster_size:,} videos ({percentage:.1f}%)")
 
 # Analyze each cluster by categories
 print(f"\n🔍 Category Analysis by Performance Cluster:")
 
-# Define categories based on search queries
-def categorize_content(search_query):
-    query = str(search_query).lower()
-    
-    if any(word in query for word in ['women', 'female', 'girl', 'mom', 'mama']):
-        return 'Women-Focused'
-    elif any(word in query for word in ['men', 'male', 'guy', 'dad', 'father']):
-        return 'Men-Focused'
-    elif any(word in query for word in ['yoga', 'pilates']):
-        return 'Yoga/Pilates'
-    elif any(word in query for word in ['strength', 'lifting', 'weights']):
-        return 'Strength Training'
-    elif any(word in query for word in ['cardio', 'running', 'treadmill']):
-        return 'Cardio'
-    elif any(word in query for word in ['hybrid']):
-        return 'Hybrid Training'
-    elif any(word in query for word in ['core', 'abs']):
-        return 'Core Training'
-    elif any(word in query for word in ['recovery', 'mobility', 'stretching']):
-        return 'Recovery/Mobility'
-    else:
-        return 'General Fitness'
-
-df['category'] = df['search_query'].apply(categorize_content)
-
-# Show category distribution across clusters
-for cluster_name, (min_val, max_val) in clusters.items():
-    cluster_data = df[(df['engagement_rate'] >= min_val) & (df['engagement_rate'] < max_val)]
-    if len(cluster_data) > 0:
+# Define categories based on search queries, checked in priority order
+CATEGORY_PATTERNS = [
+    ('Women-Focused', re.compile(r'women|female|girl|mom|mama', re.IGNORECASE)),
+    ('Men-Focused', re.compile(r'men|male|guy|dad|father', re.IGNORECASE)),
+    ('Yoga/Pilates', re.compile(r'yoga|pilates', re.IGNORECASE)),
+    ('Strength Training', re.compile(r'strength|lifting|weights', re.IGNORECASE)),
+    ('Cardio', re.compile(r'cardio|running|treadmill', re.IGNORECASE)),
+    ('Hybrid Training', re.compile(r'hybrid', re.IGNORECASE)),
+    ('Core Training', re.compile(r'core|abs', re.IGNORECASE)),
+    ('Recovery/Mobility', re.compile(r'recovery|mobility|stretching', re.IGNORECASE)),
+]
+
+def categorize_content(search_queries):
+    """Categorize each distinct query once, then broadcast via the category codes"""
+    queries = pd.Series(search_queries.cat.categories, dtype=str)
+    conditions = [queries.str.contains(pattern) for _, pattern in CATEGORY_PATTERNS]
+    labels = np.select(conditions, [name for name, _ in CATEGORY_PATTERNS], default='General Fitness')
+    # Code -1 (missing query) picks up the trailing default
+    labels = np.append(labels, 'General Fitness').astype(object)
+    return labels[search_queries.cat.codes.to_numpy()]
+
+df['category'] = categorize_content(df['search_query'])
+
+# Show category distribution across clusters, partitioning the rows once
+cluster_groups = {cluster_names[int(code)]: group for code, group in df.groupby(cluster_codes)}
+for cluster_name in clusters:
+    cluster_data = cluster_groups.get(cluster_name)
+    if cluster_data is not None and len(cluster_data) > 0:
         print(f"\n   {cluster_name} ({len(cluster_data):,} videos):")
         category_dist = cluster_data['category'].value_counts()
         for category, count in category_dist.head(5).items():
@@ -80,10 +96,14 @@ category_performance.columns = ['Video_Count', 'Avg_Engagement', 'Median_Engagem
 category_performance = category_performance.sort_values('Avg_Engagement', ascending=False)
 
 print("   Category Rankings (by average engagement):")
-for category, row in category_performance.iterrows():
-    print(f"     {category}: {row['Avg_Engagement']:.2f}% avg ({row['Video_Count']} videos)")
+print("\n".join(
+    f"     {row.Index}: {row.Avg_Engagement:.2f}% avg ({row.Video_Count} videos)"
+    for row in category_performance.itertuples()
+))
 
 # Look at high performers specifically
+category_totals = df['category'].value_counts()
+
 print(f"\n⭐ High Performance Analysis (>10% engagement):")
 high_performers = df[df['engagement_rate'] > 10]
 print(f"   Total high performers: {len(high_performers)} videos ({len(high_performers)/len(df)*100:.1f}%)")
@@ -91,7 +111,7 @@ print(f"   Total high performers: {len(high_performers)} videos ({len(high_perfo
 high_perf_categories = high_performers['category'].value_counts()
 print(f"   High performer categories:")
 for category, count in high_perf_categories.items():
-    category_total = len(df[df['category'] == category])
+    category_total = category_totals[category]
     success_rate = (count / category_total) * 100
     print(f"     {category}: {count} videos ({success_rate:.1f}% of category)")
 
@@ -104,18 +124,21 @@ if len(exceptional) > 0:
     exceptional_categories = exceptional['category'].value_counts()
     print(f"   Exceptional performer categories:")
     for category, count in exceptional_categories.items():
-        category_total = len(df[df['category'] == category])
+        category_total = category_totals[category]
         success_rate = (count / category_total) * 100
         print(f"     {category}: {count} videos ({success_rate:.1f}% of category)")
 
 # Creator analysis in high performance
 print(f"\n👤 Creators in High Performance Cluster:")
-high_perf_creators = high_performers['creator_username'].value_counts()
+# Count on plain strings: a categorical value_counts would also list creators with no high performers
+high_perf_creators = high_performers['creator_username'].astype(object).value_counts()
+# Per-creator totals in one grouped pass instead of two full-column filters per creator
+creator_stats = df.groupby('creator_username', observed=True)['engagement_rate'].agg(['size', 'mean'])
 print(f"   Top creators with high-performing content:")
 for creator, count in high_perf_creators.head(10).items():
-    creator_total = len(df[df['creator_username'] == creator])
+    creator_total = int(creator_stats.at[creator, 'size'])
+    avg_engagement = creator_stats.at[creator, 'mean']
     success_rate = (count / creator_total) * 100
-    avg_engagement = df[df['creator_username'] == creator]['engagement_rate'].mean()
     print(f"     @{creator}: {count}/{creator_total} videos high-performing ({success_rate:.0f}%), {avg_engagement:.1f}% avg")
 
 print(f"\n💡 Key Insights:")
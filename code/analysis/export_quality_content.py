@@ -1,39 +1,40 @@
 #!/usr/bin/env python3
 """Export high-quality content for further analysis"""
 
-import pandas as pd
 import re
 
-# Load results
-df = pd.read_csv('extracted_content/video_content_analysis.csv')
+from utils import read_csv
+
+# Load only the columns used for filtering and export
+USECOLS = ['video_id', 'filename', 'duration_seconds', 'spoken_phrases', 'on_screen_text']
+DTYPES = {'duration_seconds': 'float64'}
+
+df = read_csv('extracted_content/video_content_analysis.csv', usecols=USECOLS, dtype=DTYPES)
 
 # Define quality criteria
-def has_meaningful_audio(row):
-    """Check if audio transcription has meaningful content"""
-    if pd.isna(row['spoken_phrases']) or row['spoken_phrases'] == '':
-        return False
-    # At least 50 characters and 10 words
-    text = str(row['spoken_phrases'])
-    words = text.split()
-    return len(text) > 50 and len(words) >= 10
-
-def has_fitness_keywords(text):
-    """Check if text contains fitness-related keywords"""
-    if pd.isna(text):
-        return False
-    text_lower = str(text).lower()
-    fitness_keywords = [
-        'workout', 'exercise', 'reps', 'sets', 'seconds', 'minutes',
-        'squat', 'lunge', 'plank', 'push', 'pull', 'core', 'abs',
-        'cardio', 'strength', 'hiit', 'pilates', 'yoga', 'barre',
-        'burn', 'sweat', 'muscle', 'body', 'fitness', 'train',
-        'repeat', 'rest', 'round', 'circuit'
-    ]
-    return any(keyword in text_lower for keyword in fitness_keywords)
+def has_meaningful_audio(texts):
+    """Check which audio transcriptions have meaningful content"""
+    texts = texts.fillna('').astype(str)
+    # At least 50 characters and 10 words, counted without building a word list per row
+    return (texts.str.len() > 50) & (texts.str.count(r'\S+') >= 10)
+
+FITNESS_KEYWORDS = [
+    'workout', 'exercise', 'reps', 'sets', 'seconds', 'minutes',
+    'squat', 'lunge', 'plank', 'push', 'pull', 'core', 'abs',
+    'cardio', 'strength', 'hiit', 'pilates', 'yoga', 'barre',
+    'burn', 'sweat', 'muscle', 'body', 'fitness', 'train',
+    'repeat', 'rest', 'round', 'circuit'
+]
+# One alternation compiled once, so each row is a single regex scan
+FITNESS_KEYWORDS_RE = re.compile('|'.join(map(re.escape, FITNESS_KEYWORDS)), re.IGNORECASE)
+
+def has_fitness_keywords(texts):
+    """Check which texts contain fitness-related keywords"""
+    return texts.fillna('').astype(str).str.contains(FITNESS_KEYWORDS_RE)
 
 # Filter for quality content
-df['has_meaningful_audio'] = df.apply(has_meaningful_audio, axis=1)
-df['has_fitness_content'] = df['spoken_phrases'].apply(has_fitness_keywords)
+df['has_meaningful_audio'] = has_meaningful_audio(df['spoken_phrases'])
+df['has_fitness_content'] = has_fitness_keywords(df['spoken_phrases'])
 
 # Get high-quality subset
 quality_df = df[df['has_meaningful_audio'] & df['has_fitness_content']].copy()
@@ -69,7 +70,7 @@ for query, count in query_counts.items():
 
 # Sample content
 print("\n=== SAMPLE HIGH-QUALITY CONTENT ===")
-for _, row in quality_df.head(3).iterrows():
-    print(f"\nVideo: {row['filename']}")
-    print(f"Duration: {row['duration_seconds']:.1f} seconds")
-    print(f"Transcription: {row['spoken_phrases'][:200]}...")
\ No newline at end of file
+for row in quality_df.head(3).itertuples(index=False):
+    print(f"\nVideo: {row.filename}")
+    print(f"Duration: {row.duration_seconds:.1f} seconds")
+    print(f"Transcription: {row.spoken_phrases[:200]}...")
\ No newline at end of file
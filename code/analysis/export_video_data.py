@@ -4,11 +4,13 @@ Export all TikTok video data to comprehensive CSV file
 Combines data from Apify JSON files and individual metadata files
 """
 import os
-import json
 import csv
 from datetime import datetime
+from operator import itemgetter
 import re
 
+from utils import load_json, query_from_filename
+
 # Directories
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 APIFY_DIR = os.path.join(BASE_DIR, "apify_downloads")
@@ -18,9 +20,11 @@ OUTPUT_DIR = os.path.join(BASE_DIR, "exports")
 # Create exports directory
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+HASHTAG_RE = re.compile(r'#\w+')
+
 def extract_hashtags(text):
     """Extract hashtags from video text"""
-    return ' '.join(re.findall(r'#\w+', text))
+    return ' '.join(HASHTAG_RE.findall(text))
 
 def calculate_engagement_rate(video_data):
     """Calculate engagement rate (likes + comments + shares) / views"""
@@ -96,17 +100,14 @@ def main():
     for json_file in sorted(json_files):
         # Extract search query from filename
         if json_file.startswith('tiktok_') and json_file.endswith('.json'):
-            search_query = json_file[7:]  # Remove 'tiktok_'
-            search_query = '_'.join(search_query.split('_')[:-2])  # Remove timestamp
-            search_query = search_query.replace('_', ' ')
+            search_query = query_from_filename(json_file).replace('_', ' ')
         else:
             search_query = 'unknown'
         
         # Read JSON file
         json_path = os.path.join(APIFY_DIR, json_file)
         try:
-            with open(json_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = load_json(json_path)
             
             if isinstance(data, list):
                 for video_data in data:
@@ -128,7 +129,7 @@ def main():
     print(f"📊 Processed {len(all_videos)} unique videos")
     
     # Sort by engagement rate
-    all_videos.sort(key=lambda x: x['engagement_rate'], reverse=True)
+    all_videos.sort(key=itemgetter('engagement_rate'), reverse=True)
     
     # Write to CSV
     output_file = os.path.join(OUTPUT_DIR, f'tiktok_videos_all_{datetime.now().strftime("%Y%m%d")}.csv')
@@ -3,10 +3,12 @@
 Export clean TikTok video data - filtering out unknown/error entries
 """
 import os
-import json
-import csv
 from datetime import datetime
 import re
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+
+from utils import load_json, query_from_filename, with_nullable_ints, write_parquet_copy
 
 # Directories
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -14,24 +16,24 @@ APIFY_DIR = os.path.join(BASE_DIR, "apify_downloads")
 VIDEOS_DIR = os.path.join(BASE_DIR, "videos")
 OUTPUT_DIR = os.path.join(BASE_DIR, "exports")
 
-def extract_hashtags(text):
-    """Extract hashtags from video text"""
-    return ' '.join(re.findall(r'#\w+', text))
+# Placeholder queries left behind when the search term couldn't be recovered
+INVALID_QUERIES = frozenset({'unknown', 'unknown_search', ''})
 
-def calculate_engagement_rate(video_data):
-    """Calculate engagement rate (likes + comments + shares) / views"""
-    likes = video_data.get('diggCount', 0)
-    comments = video_data.get('commentCount', 0)
-    shares = video_data.get('shareCount', 0)
-    views = video_data.get('playCount', 1)
-    
-    if views > 0:
-        return ((likes + comments + shares) / views) * 100
-    return 0
+HASHTAG_RE = re.compile(r'#\w+')
+
+def extract_hashtags(captions):
+    """Extract space-separated hashtags from a column of video captions"""
+    return captions.str.findall(HASHTAG_RE).str.join(' ')
+
+def calculate_engagement_rate(videos):
+    """Calculate engagement rate (likes + comments + shares) / views for every video"""
+    views = videos['views']
+    rate = ((videos['likes'] + videos['comments'] + videos['shares']) / views) * 100
+    return rate.where(views > 0, 0)
 
 def is_valid_search_query(query):
     """Check if search query is valid (not unknown or error-like)"""
-    if not query or query.lower() in ['unknown', 'unknown_search', '']:
+    if not query or query.lower() in INVALID_QUERIES:
         return False
     if len(query) < 3:  # Too short
         return False
@@ -57,7 +59,6 @@ def process_video_data(video_data, search_query):
         'video_id': video_data.get('id', ''),
         'search_query': search_query,
         'caption': video_data.get('text', ''),
-        'hashtags': extract_hashtags(video_data.get('text', '')),
         'create_time': video_data.get('createTimeISO', ''),
         
         # Creator info
@@ -71,7 +72,6 @@ def process_video_data(video_data, search_query):
         'likes': video_data.get('diggCount', 0),
         'comments': video_data.get('commentCount', 0),
         'shares': video_data.get('shareCount', 0),
-        'engagement_rate': calculate_engagement_rate(video_data),
         
         # Video details
         'duration_seconds': video_meta.get('duration', 0),
@@ -83,6 +83,21 @@ def process_video_data(video_data, search_query):
         'local_video_filename': ''
     }
 
+def process_json_file(json_path, search_query):
+    """Load one Apify JSON file and return (video_id, video_info) pairs plus any error"""
+    records = []
+    try:
+        data = load_json(json_path)
+        
+        if isinstance(data, list):
+            for video_data in data:
+                video_id = video_data.get('id', '')
+                if video_id:
+                    records.append((video_id, process_video_data(video_data, search_query)))
+    except Exception as e:
+        return records, e
+    return records, None
+
 def main():
     print("🧹 Starting clean TikTok video data export...")
     
@@ -93,12 +108,13 @@ def main():
     
     # Create video file lookup
     video_files = {}
-    for filename in os.listdir(VIDEOS_DIR):
-        if filename.endswith('.mp4'):
-            parts = filename.rsplit('_', 1)
-            if len(parts) == 2:
-                video_id = parts[1].replace('.mp4', '')
-                video_files[video_id] = filename
+    with os.scandir(VIDEOS_DIR) as entries:
+        for entry in entries:
+            filename = entry.name
+            if filename.endswith('.mp4'):
+                _, sep, video_id = filename.rpartition('_')
+                if sep:
+                    video_files[video_id[:-4]] = filename
     
     print(f"📹 Found {len(video_files)} local video files")
     
@@ -108,12 +124,13 @@ def main():
     
     print(f"📂 Processing {len(json_files)} JSON files (excluding unknown files)")
     
+    file_names = []
+    json_paths = []
+    search_queries = []
     for json_file in sorted(json_files):
         # Extract search query
         if json_file.startswith('tiktok_') and json_file.endswith('.json'):
-            search_query = json_file[7:]  # Remove 'tiktok_'
-            search_query = '_'.join(search_query.split('_')[:-2])  # Remove timestamp
-            search_query = search_query.replace('_', ' ')
+            search_query = query_from_filename(json_file).replace('_', ' ')
         else:
             continue
         
@@ -122,41 +139,34 @@ def main():
             skipped_unknown += 1
             continue
         
-        json_path = os.path.join(APIFY_DIR, json_file)
-        try:
-            with open(json_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            if isinstance(data, list):
-                for video_data in data:
-                    video_id = video_data.get('id', '')
-                    if video_id and video_id not in video_ids_processed:
-                        video_info = process_video_data(video_data, search_query)
+        file_names.append(json_file)
+        json_paths.append(os.path.join(APIFY_DIR, json_file))
+        search_queries.append(search_query)
+    
+    # Parse files in parallel; dedupe serially in file order so results match a sequential run
+    with ProcessPoolExecutor() as executor:
+        results = executor.map(process_json_file, json_paths, search_queries, chunksize=8)
+        for json_file, (records, error) in zip(file_names, results):
+            for video_id, video_info in records:
+                if video_id not in video_ids_processed:
+                    if video_info:  # Only add if valid
+                        # Check if we have local video
+                        if video_id in video_files:
+                            video_info['has_local_video'] = True
+                            video_info['local_video_filename'] = video_files[video_id]
                         
-                        if video_info:  # Only add if valid
-                            # Check if we have local video
-                            if video_id in video_files:
-                                video_info['has_local_video'] = True
-                                video_info['local_video_filename'] = video_files[video_id]
-                            
-                            all_videos.append(video_info)
-                            video_ids_processed.add(video_id)
-                        else:
-                            skipped_invalid += 1
-        
-        except Exception as e:
-            print(f"⚠️  Error processing {json_file}: {e}")
+                        all_videos.append(video_info)
+                        video_ids_processed.add(video_id)
+                    else:
+                        skipped_invalid += 1
+            
+            if error is not None:
+                print(f"⚠️  Error processing {json_file}: {error}")
     
     print(f"✅ Processed {len(all_videos)} valid videos")
     print(f"⏭️  Skipped {skipped_unknown} files with unknown queries")
     print(f"⏭️  Skipped {skipped_invalid} invalid video entries")
     
-    # Sort by engagement rate
-    all_videos.sort(key=lambda x: x['engagement_rate'], reverse=True)
-    
-    # Write clean CSV
-    output_file = os.path.join(OUTPUT_DIR, f'tiktok_videos_clean_{datetime.now().strftime("%Y%m%d")}.csv')
-    
     fieldnames = [
         'video_id', 'search_query', 'caption', 'hashtags', 'create_time',
         'creator_username', 'creator_nickname', 'creator_followers', 'creator_verified',
@@ -165,20 +175,32 @@ def main():
         'has_local_video', 'local_video_filename'
     ]
     
-    with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(all_videos)
+    # Derive the computed columns, then sort by engagement rate
+    videos_df = pd.DataFrame(all_videos, columns=fieldnames)
+    videos_df['hashtags'] = extract_hashtags(videos_df['caption'])
+    videos_df['engagement_rate'] = calculate_engagement_rate(videos_df)
+    videos_df = videos_df.sort_values('engagement_rate', ascending=False, kind='stable')
+    # Keep counts as integers even when a value is missing
+    videos_df = with_nullable_ints(videos_df, ['creator_followers', 'views', 'likes', 'comments',
+                                               'shares', 'duration_seconds'])
+    
+    # Write clean CSV in one batched call
+    output_file = os.path.join(OUTPUT_DIR, f'tiktok_videos_clean_{datetime.now().strftime("%Y%m%d")}.csv')
+    videos_df.to_csv(output_file, index=False, encoding='utf-8', lineterminator='\r\n')
+    parquet_file = write_parquet_copy(videos_df, output_file)
     
     print(f"✅ Clean export complete! File saved to: {output_file}")
+    if parquet_file:
+        print(f"   Parquet copy: {parquet_file}")
     print(f"📊 Summary:")
-    print(f"   Clean videos: {len(all_videos):,}")
-    print(f"   Videos with local files: {len([v for v in all_videos if v['has_local_video']]):,}")
-    print(f"   Average engagement rate: {sum(v['engagement_rate'] for v in all_videos) / len(all_videos):.2f}%")
+    print(f"   Clean videos: {len(videos_df):,}")
+    print(f"   Videos with local files: {videos_df['has_local_video'].sum():,}")
+    print(f"   Average engagement rate: {videos_df['engagement_rate'].mean():.2f}%")
     
     print(f"\n📈 Top 5 videos by engagement rate:")
-    for i, video in enumerate(all_videos[:5], 1):
-        print(f"   {i}. {video['creator_username']} - {video['engagement_rate']:.2f}% - {video['caption'][:50]}...")
+    top_videos = videos_df[['creator_username', 'engagement_rate', 'caption']].head(5)
+    for i, (creator, engagement_rate, caption) in enumerate(top_videos.itertuples(index=False), 1):
+        print(f"   {i}. {creator} - {engagement_rate:.2f}% - {caption[:50]}...")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -3,20 +3,28 @@
 Export refined TikTok video data - only removing truly broken entries
 """
 import os
-import json
 import csv
+import hashlib
+import pickle
 from datetime import datetime
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor
 import re
 
+import utils
+from utils import load_json, query_from_filename
+
 # Directories
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 APIFY_DIR = os.path.join(BASE_DIR, "apify_downloads")
 VIDEOS_DIR = os.path.join(BASE_DIR, "videos")
 OUTPUT_DIR = os.path.join(BASE_DIR, "exports")
 
+HASHTAG_RE = re.compile(r'#\w+')
+
 def extract_hashtags(text):
     """Extract hashtags from video text"""
-    return ' '.join(re.findall(r'#\w+', text))
+    return ' '.join(HASHTAG_RE.findall(text))
 
 def calculate_engagement_rate(video_data):
     """Calculate engagement rate (likes + comments + shares) / views"""
@@ -93,13 +101,82 @@ def process_video_data(video_data, search_query):
         'local_video_filename': ''
     }
 
-def main():
-    print("🔧 Starting refined TikTok video data export...")
-    print("   Only removing truly broken entries (no data at all)")
-    
+def load_json_safely(json_path):
+    """Load a JSON file, returning (data, error) so read failures are reported in file order"""
+    try:
+        return load_json(json_path), None
+    except Exception as e:
+        return None, e
+
+def collect_videos(json_files, video_files):
+    """Parse every Apify file in sorted order, returning (videos, skipped_broken_count, load_errors)
+
+    load_errors holds (json_file, message) pairs in file order, so cached runs can report them again.
+    """
     all_videos = []
     video_ids_processed = set()
     skipped_broken = 0
+    load_errors = []
+    
+    # Read the next file on a background thread while this one is processed, so at most
+    # one parsed file is held ahead of the loop
+    json_paths = [os.path.join(APIFY_DIR, json_file) for json_file in json_files]
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        next_load = executor.submit(load_json_safely, json_paths[0]) if json_paths else None
+        for index, json_file in enumerate(json_files):
+            data, load_error = next_load.result()
+            if index + 1 < len(json_paths):
+                next_load = executor.submit(load_json_safely, json_paths[index + 1])
+            
+            # Extract search query - keep 'unknown' if that's what it actually is
+            if json_file.startswith('tiktok_') and json_file.endswith('.json'):
+                search_query = query_from_filename(json_file).replace('_', ' ')
+            else:
+                search_query = 'unknown_search'
+            
+            if load_error is not None:
+                load_errors.append((json_file, str(load_error)))
+                continue
+            
+            try:
+                if isinstance(data, list):
+                    for video_data in data:
+                        video_id = video_data.get('id', '')
+                        
+                        # Skip only if truly broken
+                        if is_broken_video(video_data):
+                            skipped_broken += 1
+                            continue
+                        
+                        if video_id and video_id not in video_ids_processed:
+                            video_info = process_video_data(video_data, search_query)
+                            
+                            # Check if we have local video
+                            if video_id in video_files:
+                                video_info['has_local_video'] = True
+                                video_info['local_video_filename'] = video_files[video_id]
+                            
+                            all_videos.append(video_info)
+                            video_ids_processed.add(video_id)
+            
+            except Exception as e:
+                load_errors.append((json_file, str(e)))
+    
+    return all_videos, skipped_broken, load_errors
+
+def inputs_fingerprint(json_paths, video_files):
+    """Hash the input file stats, local video names, this script and utils.py so unchanged runs can reuse results"""
+    digest = hashlib.blake2b(digest_size=16)
+    for path in [os.path.abspath(__file__), os.path.abspath(utils.__file__)] + json_paths:
+        stat = os.stat(path)
+        digest.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns}\n".encode('utf-8'))
+    for filename in sorted(video_files.values()):
+        digest.update(filename.encode('utf-8'))
+    return digest.hexdigest()
+
+def main():
+    print("🔧 Starting refined TikTok video data export...")
+    print("   Only removing truly broken entries (no data at all)")
     
     # Create video file lookup
     video_files = {}
@@ -117,42 +194,39 @@ def main():
     
     print(f"📂 Processing all {len(json_files)} JSON files")
     
-    for json_file in sorted(json_files):
-        # Extract search query - keep 'unknown' if that's what it actually is
-        if json_file.startswith('tiktok_') and json_file.endswith('.json'):
-            search_query = json_file[7:]  # Remove 'tiktok_'
-            search_query = '_'.join(search_query.split('_')[:-2])  # Remove timestamp
-            search_query = search_query.replace('_', ' ')
-        else:
-            search_query = 'unknown_search'
-        
-        json_path = os.path.join(APIFY_DIR, json_file)
+    json_files = sorted(json_files)
+    
+    # Reuse the parsed videos from the last run when none of the inputs changed.
+    # One cache file holds (fingerprint, payload), so stale results are overwritten rather than piling up
+    fingerprint = inputs_fingerprint([os.path.join(APIFY_DIR, json_file) for json_file in json_files], video_files)
+    cache_path = os.path.join(OUTPUT_DIR, '.cache', 'refined_videos.pkl')
+    cached = None
+    if os.path.exists(cache_path):
         try:
-            with open(json_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            if isinstance(data, list):
-                for video_data in data:
-                    video_id = video_data.get('id', '')
-                    
-                    # Skip only if truly broken
-                    if is_broken_video(video_data):
-                        skipped_broken += 1
-                        continue
-                    
-                    if video_id and video_id not in video_ids_processed:
-                        video_info = process_video_data(video_data, search_query)
-                        
-                        # Check if we have local video
-                        if video_id in video_files:
-                            video_info['has_local_video'] = True
-                            video_info['local_video_filename'] = video_files[video_id]
-                        
-                        all_videos.append(video_info)
-                        video_ids_processed.add(video_id)
-        
-        except Exception as e:
-            print(f"⚠️  Error processing {json_file}: {e}")
+            with open(cache_path, 'rb') as f:
+                cached_fingerprint, payload = pickle.load(f)
+            if cached_fingerprint == fingerprint:
+                cached = payload
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):  # Unreadable cache - parse again
+            pass
+    
+    if cached is not None:
+        print("♻️  Inputs unchanged since last run - reusing parsed videos")
+        all_videos, skipped_broken, load_errors = cached
+    else:
+        all_videos, skipped_broken, load_errors = collect_videos(json_files, video_files)
+        tmp_path = cache_path + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                pickle.dump((fingerprint, (all_videos, skipped_broken, load_errors)), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except OSError:  # Unwritable dir - skip the cache
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    
+    for json_file, message in load_errors:
+        print(f"⚠️  Error processing {json_file}: {message}")
     
     print(f"✅ Processed {len(all_videos)} valid videos")
     print(f"🗑️  Skipped {skipped_broken} truly broken entries")
@@ -164,7 +238,7 @@ def main():
         query_counts[query] = query_counts.get(query, 0) + 1
     
     # Sort by engagement rate
-    all_videos.sort(key=lambda x: x['engagement_rate'], reverse=True)
+    all_videos.sort(key=itemgetter('engagement_rate'), reverse=True)
     
     # Write refined CSV
     output_file = os.path.join(OUTPUT_DIR, f'tiktok_videos_refined_{datetime.now().strftime("%Y%m%d")}.csv')
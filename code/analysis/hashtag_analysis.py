@@ -3,130 +3,228 @@
 Analyze hashtag usage patterns and effectiveness
 """
 import os
-import json
 import csv
 import re
-from collections import Counter, defaultdict
+import numpy as np
+from collections import Counter
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+from utils import load_json
+
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick is optional - fall back to the compiled regexes
+    ahocorasick = None
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional - fall back to np.bincount
+    njit = None
 
 # Directories
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 APIFY_DIR = os.path.join(BASE_DIR, "apify_downloads")
 OUTPUT_DIR = os.path.join(BASE_DIR, "exports")
 
+HASHTAG_RE = re.compile(r'#(\w+)')
+
+# Modality keywords, checked in priority order
+MODALITIES = {
+    'strength': ['strength', 'lifting', 'weights', 'powerlifting', 'strongman'],
+    'cardio': ['cardio', 'hiit', 'running', 'cycling', 'endurance'],
+    'yoga': ['yoga', 'pilates', 'flexibility', 'stretch'],
+    'crossfit': ['crossfit', 'wod', 'metcon', 'amrap'],
+    'calisthenics': ['calisthenics', 'bodyweight', 'pullups', 'pushups'],
+    'general': ['fitness', 'workout', 'exercise', 'gym', 'training']
+}
+# One compiled alternation per modality; keywords still match anywhere in the text
+MODALITY_PATTERNS = [
+    (modality, re.compile('|'.join(map(re.escape, keywords))))
+    for modality, keywords in MODALITIES.items()
+]
+
+MODALITY_ORDER = list(MODALITIES)
+# Report order, with unmatched videos last; positions double as modality ids
+MODALITY_IDS = {modality: i for i, modality in enumerate(MODALITY_ORDER + ['other'])}
+
+# With pyahocorasick every keyword is found in one pass over the text,
+# tagged with its modality's priority
+MODALITY_AUTOMATON = None
+if ahocorasick is not None:
+    MODALITY_AUTOMATON = ahocorasick.Automaton()
+    for priority, keywords in enumerate(MODALITIES.values()):
+        for keyword in keywords:
+            MODALITY_AUTOMATON.add_word(keyword, priority)
+    MODALITY_AUTOMATON.make_automaton()
+
 def extract_hashtags(text):
     """Extract hashtags from text"""
-    return [tag.lower() for tag in re.findall(r'#(\w+)', text)]
+    return [tag.lower() for tag in HASHTAG_RE.findall(text)]
+
+def classify_modality(text_lower):
+    """Return the first modality whose keywords appear in the lowercased text"""
+    if MODALITY_AUTOMATON is not None:
+        priority = min((priority for _, priority in MODALITY_AUTOMATON.iter(text_lower)), default=None)
+        return MODALITY_ORDER[priority] if priority is not None else 'other'
+    
+    for modality, pattern in MODALITY_PATTERNS:
+        if pattern.search(text_lower):
+            return modality
+    return 'other'
+
+def _scatter_add(tag_ids, views, engagement, tag_videos, tag_views, tag_engagement):
+    for i in range(tag_ids.shape[0]):
+        tag_id = tag_ids[i]
+        tag_videos[tag_id] += 1
+        tag_views[tag_id] += views[i]
+        tag_engagement[tag_id] += engagement[i]
+
+if njit is not None:
+    _scatter_add = njit(cache=True)(_scatter_add)
+
+def sum_tag_stats(tag_ids, views, engagement, tag_count):
+    """Sum videos, views and engagement per tag id over the per-occurrence columns"""
+    tag_ids = np.asarray(tag_ids, dtype=np.int64)
+    if njit is None:
+        return (np.bincount(tag_ids, minlength=tag_count),
+                np.bincount(tag_ids, weights=views, minlength=tag_count),
+                np.bincount(tag_ids, weights=engagement, minlength=tag_count))
+    
+    # Compiled scatter-add keeps the totals as exact int64
+    tag_videos = np.zeros(tag_count, dtype=np.int64)
+    tag_views = np.zeros(tag_count, dtype=np.int64)
+    tag_engagement = np.zeros(tag_count, dtype=np.int64)
+    _scatter_add(tag_ids, np.asarray(views, dtype=np.int64), np.asarray(engagement, dtype=np.int64),
+                 tag_videos, tag_views, tag_engagement)
+    return tag_videos, tag_views, tag_engagement
+
+def process_file(json_path):
+    """Parse one Apify file into per-video hashtag records, returning (records, error)"""
+    records = []
+    try:
+        data = load_json(json_path)
+        
+        if isinstance(data, list):
+            for video_data in data:
+                text = video_data.get('text', '')
+                hashtags = extract_hashtags(text)
+                
+                if hashtags:
+                    # Read each video-level metric once; null counts are treated as zero rather than failing the file
+                    views = video_data.get('playCount', 0) or 0
+                    likes = video_data.get('diggCount', 0) or 0
+                    comments = video_data.get('commentCount', 0) or 0
+                    shares = video_data.get('shareCount', 0) or 0
+                    records.append((
+                        video_data.get('id', ''),
+                        hashtags,
+                        views,
+                        likes + comments + shares,
+                        classify_modality(text.lower())
+                    ))
+    except Exception as e:
+        return records, e
+    return records, None
 
 def main():
     print("🏷️  Analyzing hashtag patterns...")
     
-    hashtag_counter = Counter()
-    hashtag_stats = defaultdict(lambda: {'videos': 0, 'total_views': 0, 'total_engagement': 0})
+    # One date stamp for every report file, even if the run crosses midnight
+    run_date = datetime.now().strftime("%Y%m%d")
+    
+    # Per-hashtag stats (usage counts included) are kept as flat per-occurrence columns
+    # keyed by an integer tag id, then summed into one array per stat by sum_tag_stats
+    tag_ids = {}
+    occurrence_tag_ids = []
+    occurrence_views = []
+    occurrence_engagement = []
+    occurrence_modality_ids = []
     hashtag_combinations = Counter()
-    modality_hashtags = defaultdict(Counter)
-    
-    # Define modality keywords
-    modalities = {
-        'strength': ['strength', 'lifting', 'weights', 'powerlifting', 'strongman'],
-        'cardio': ['cardio', 'hiit', 'running', 'cycling', 'endurance'],
-        'yoga': ['yoga', 'pilates', 'flexibility', 'stretch'],
-        'crossfit': ['crossfit', 'wod', 'metcon', 'amrap'],
-        'calisthenics': ['calisthenics', 'bodyweight', 'pullups', 'pushups'],
-        'general': ['fitness', 'workout', 'exercise', 'gym', 'training']
-    }
     
     all_videos_data = []
     
-    # Process all JSON files
-    json_files = [f for f in os.listdir(APIFY_DIR) if f.endswith('.json') and f.startswith('tiktok_')]
+    # Process all JSON files - parsing and tagging run in worker processes,
+    # aggregation stays here and consumes files in sorted order
+    with os.scandir(APIFY_DIR) as entries:
+        json_entries = sorted((entry.name, entry.path) for entry in entries
+                              if entry.name.startswith('tiktok_') and entry.name.endswith('.json') and entry.is_file())
+    json_files = [name for name, _ in json_entries]
+    json_paths = [path for _, path in json_entries]
     
-    for json_file in sorted(json_files):
-        search_query = json_file[7:]
-        search_query = '_'.join(search_query.split('_')[:-2])
-        
-        json_path = os.path.join(APIFY_DIR, json_file)
-        try:
-            with open(json_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+    with ProcessPoolExecutor() as executor:
+        results = executor.map(process_file, json_paths, chunksize=8)
+        for json_file, (records, error) in zip(json_files, results):
+            for video_id, hashtags, views, engagement, video_modality in records:
+                # Record individual hashtag uses
+                occurrence_tag_ids.extend([tag_ids.setdefault(tag, len(tag_ids)) for tag in hashtags])
+                occurrence_views.extend([views] * len(hashtags))
+                occurrence_engagement.extend([engagement] * len(hashtags))
+                occurrence_modality_ids.extend([MODALITY_IDS[video_modality]] * len(hashtags))
+                
+                # Count hashtag combinations (pairs)
+                # Sorting the distinct tags once yields every pair already in order
+                unique_tags = sorted(set(hashtags))
+                if len(unique_tags) > 1:
+                    hashtag_combinations.update(combinations(unique_tags, 2))
+                
+                # Store for detailed analysis
+                all_videos_data.append({
+                    'video_id': video_id,
+                    'hashtags': hashtags,
+                    'hashtag_count': len(hashtags),
+                    'views': views,
+                    'engagement': engagement,
+                    'modality': video_modality
+                })
             
-            if isinstance(data, list):
-                for video_data in data:
-                    text = video_data.get('text', '')
-                    hashtags = extract_hashtags(text)
-                    
-                    if hashtags:
-                        # Count individual hashtags
-                        for tag in hashtags:
-                            hashtag_counter[tag] += 1
-                            hashtag_stats[tag]['videos'] += 1
-                            hashtag_stats[tag]['total_views'] += video_data.get('playCount', 0)
-                            
-                            engagement = (video_data.get('diggCount', 0) + 
-                                        video_data.get('commentCount', 0) + 
-                                        video_data.get('shareCount', 0))
-                            hashtag_stats[tag]['total_engagement'] += engagement
-                        
-                        # Count hashtag combinations (pairs)
-                        if len(hashtags) > 1:
-                            for i in range(len(hashtags)):
-                                for j in range(i+1, len(hashtags)):
-                                    pair = tuple(sorted([hashtags[i], hashtags[j]]))
-                                    hashtag_combinations[pair] += 1
-                        
-                        # Categorize by modality
-                        video_modality = 'other'
-                        text_lower = text.lower()
-                        for modality, keywords in modalities.items():
-                            if any(keyword in text_lower for keyword in keywords):
-                                video_modality = modality
-                                break
-                        
-                        for tag in hashtags:
-                            modality_hashtags[video_modality][tag] += 1
-                        
-                        # Store for detailed analysis
-                        all_videos_data.append({
-                            'video_id': video_data.get('id', ''),
-                            'hashtags': hashtags,
-                            'hashtag_count': len(hashtags),
-                            'views': video_data.get('playCount', 0),
-                            'engagement': engagement,
-                            'modality': video_modality
-                        })
-        
-        except Exception as e:
-            print(f"⚠️  Error processing {json_file}: {e}")
+            if error is not None:
+                print(f"⚠️  Error processing {json_file}: {error}")
+    
+    # Calculate average stats for each hashtag (every tag id has at least one video)
+    tag_names = list(tag_ids)
+    occurrence_tag_ids = np.asarray(occurrence_tag_ids, dtype=np.int64)
+    tag_videos, tag_total_views, tag_total_engagement = sum_tag_stats(
+        occurrence_tag_ids, occurrence_views, occurrence_engagement, len(tag_names))
+    
+    tag_avg_views = tag_total_views / np.maximum(tag_videos, 1)
+    tag_avg_engagement = tag_total_engagement / np.maximum(tag_videos, 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tag_engagement_rate = np.where(tag_total_views > 0, tag_total_engagement / tag_total_views * 100, 0)
+    
+    # Every use is one occurrence, so tag_videos doubles as the usage count;
+    # the stable sort keeps first-seen order for ties
+    top_tag_ids = np.argsort(-tag_videos, kind='stable')[:100]
     
-    # Calculate average stats for each hashtag
-    for tag in hashtag_stats:
-        stats = hashtag_stats[tag]
-        stats['avg_views'] = stats['total_views'] / stats['videos'] if stats['videos'] > 0 else 0
-        stats['avg_engagement'] = stats['total_engagement'] / stats['videos'] if stats['videos'] > 0 else 0
-        stats['engagement_rate'] = (stats['total_engagement'] / stats['total_views'] * 100) if stats['total_views'] > 0 else 0
+    # Per-modality hashtag counts from one pass over (modality, tag) keys, ranked by count
+    # within each modality with ties in first-seen order, as Counter.most_common did
+    modality_keys = np.asarray(occurrence_modality_ids, dtype=np.int64) * len(tag_names) + occurrence_tag_ids
+    pair_keys, pair_first_seen, pair_counts = np.unique(modality_keys, return_index=True, return_counts=True)
+    pair_modality_ids = pair_keys // len(tag_names)
+    pair_order = np.lexsort((pair_first_seen, -pair_counts, pair_modality_ids))
     
     # 1. Top 100 hashtags by frequency
     print("\n📊 Top Hashtags by Frequency")
-    freq_file = os.path.join(OUTPUT_DIR, f'hashtag_frequency_{datetime.now().strftime("%Y%m%d")}.csv')
+    freq_file = os.path.join(OUTPUT_DIR, f'hashtag_frequency_{run_date}.csv')
     
     with open(freq_file, 'w', newline='', encoding='utf-8') as csvfile:
         writer = csv.writer(csvfile)
         writer.writerow(['rank', 'hashtag', 'count', 'videos', 'avg_views', 'avg_engagement', 'engagement_rate'])
         
-        for i, (tag, count) in enumerate(hashtag_counter.most_common(100), 1):
-            stats = hashtag_stats[tag]
+        for i, tag_id in enumerate(top_tag_ids, 1):
             writer.writerow([
-                i, f"#{tag}", count, stats['videos'],
-                f"{stats['avg_views']:.0f}",
-                f"{stats['avg_engagement']:.0f}",
-                f"{stats['engagement_rate']:.2f}%"
+                i, f"#{tag_names[tag_id]}", tag_videos[tag_id], tag_videos[tag_id],
+                f"{tag_avg_views[tag_id]:.0f}",
+                f"{tag_avg_engagement[tag_id]:.0f}",
+                f"{tag_engagement_rate[tag_id]:.2f}%"
             ])
     
     print(f"✅ Saved: {freq_file}")
     
     # 2. Top hashtag combinations
     print("\n🔗 Top Hashtag Combinations")
-    combo_file = os.path.join(OUTPUT_DIR, f'hashtag_combinations_{datetime.now().strftime("%Y%m%d")}.csv')
+    combo_file = os.path.join(OUTPUT_DIR, f'hashtag_combinations_{run_date}.csv')
     
     with open(combo_file, 'w', newline='', encoding='utf-8') as csvfile:
         writer = csv.writer(csvfile)
@@ -139,56 +237,53 @@ def main():
     
     # 3. Hashtags by modality
     print("\n🏋️ Top Hashtags by Workout Type")
-    modality_file = os.path.join(OUTPUT_DIR, f'hashtags_by_modality_{datetime.now().strftime("%Y%m%d")}.csv')
+    modality_file = os.path.join(OUTPUT_DIR, f'hashtags_by_modality_{run_date}.csv')
     
     with open(modality_file, 'w', newline='', encoding='utf-8') as csvfile:
         writer = csv.writer(csvfile)
         writer.writerow(['modality', 'hashtag', 'count'])
         
-        for modality in ['strength', 'cardio', 'yoga', 'crossfit', 'calisthenics', 'general', 'other']:
-            if modality in modality_hashtags:
-                for tag, count in modality_hashtags[modality].most_common(20):
-                    writer.writerow([modality, f"#{tag}", count])
+        for modality, modality_id in MODALITY_IDS.items():
+            for pair in pair_order[pair_modality_ids[pair_order] == modality_id][:20]:
+                writer.writerow([modality, f"#{tag_names[pair_keys[pair] % len(tag_names)]}", pair_counts[pair]])
     
     print(f"✅ Saved: {modality_file}")
     
     # 4. Best performing hashtags (by engagement rate)
     print("\n⭐ Best Performing Hashtags")
-    best_hashtags = sorted(
-        [(tag, stats) for tag, stats in hashtag_stats.items() if stats['videos'] >= 10],
-        key=lambda x: x[1]['engagement_rate'],
-        reverse=True
-    )[:50]
+    # Stable sort on the negated rate keeps first-seen order for ties
+    eligible_ids = np.flatnonzero(tag_videos >= 10)
+    best_ids = eligible_ids[np.argsort(-tag_engagement_rate[eligible_ids], kind='stable')][:50]
     
-    best_file = os.path.join(OUTPUT_DIR, f'best_performing_hashtags_{datetime.now().strftime("%Y%m%d")}.csv')
+    best_file = os.path.join(OUTPUT_DIR, f'best_performing_hashtags_{run_date}.csv')
     
     with open(best_file, 'w', newline='', encoding='utf-8') as csvfile:
         writer = csv.writer(csvfile)
         writer.writerow(['rank', 'hashtag', 'videos', 'engagement_rate', 'avg_views', 'avg_engagement'])
         
-        for i, (tag, stats) in enumerate(best_hashtags, 1):
+        for i, tag_id in enumerate(best_ids, 1):
             writer.writerow([
-                i, f"#{tag}", stats['videos'],
-                f"{stats['engagement_rate']:.2f}%",
-                f"{stats['avg_views']:.0f}",
-                f"{stats['avg_engagement']:.0f}"
+                i, f"#{tag_names[tag_id]}", tag_videos[tag_id],
+                f"{tag_engagement_rate[tag_id]:.2f}%",
+                f"{tag_avg_views[tag_id]:.0f}",
+                f"{tag_avg_engagement[tag_id]:.0f}"
             ])
     
     print(f"✅ Saved: {best_file}")
     
     # Print summary
     print("\n📈 Hashtag Summary:")
-    print(f"   Total unique hashtags: {len(hashtag_counter):,}")
-    print(f"   Total hashtag uses: {sum(hashtag_counter.values()):,}")
+    print(f"   Total unique hashtags: {len(tag_names):,}")
+    print(f"   Total hashtag uses: {occurrence_tag_ids.size:,}")
     print(f"   Average hashtags per video: {sum(v['hashtag_count'] for v in all_videos_data) / len(all_videos_data):.1f}")
     
     print("\n🏷️  Top 10 Most Used Hashtags:")
-    for i, (tag, count) in enumerate(hashtag_counter.most_common(10), 1):
-        print(f"   {i}. #{tag} ({count:,} uses)")
+    for i, tag_id in enumerate(top_tag_ids[:10], 1):
+        print(f"   {i}. #{tag_names[tag_id]} ({tag_videos[tag_id]:,} uses)")
     
     print("\n💎 Top 5 Best Performing Hashtags (min 10 videos):")
-    for i, (tag, stats) in enumerate(best_hashtags[:5], 1):
-        print(f"   {i}. #{tag} ({stats['engagement_rate']:.1f}% engagement on {stats['videos']} videos)")
+    for i, tag_id in enumerate(best_ids[:5], 1):
+        print(f"   {i}. #{tag_names[tag_id]} ({tag_engagement_rate[tag_id]:.1f}% engagement on {tag_videos[tag_id]} videos)")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
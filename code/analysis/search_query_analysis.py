@@ -3,149 +3,114 @@
 Analyze search query performance - which searches yielded the best content
 """
 import os
-import json
 import csv
+import re
 from collections import defaultdict
+from dataclasses import dataclass, field
 from datetime import datetime
+from operator import itemgetter
 import statistics
 
+import numpy as np
+import pandas as pd
+
+from utils import load_video_columns, open_csv_output
+
 # Directories
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 APIFY_DIR = os.path.join(BASE_DIR, "apify_downloads")
 OUTPUT_DIR = os.path.join(BASE_DIR, "exports")
 
+@dataclass(slots=True)
+class CategoryStats:
+    """Matched queries and running sums for one query category"""
+    queries: list = field(default_factory=list)
+    total_videos: int = 0
+    total_engagement_rate: float = 0
+
 def main():
     print("🔍 Analyzing search query performance...")
     
-    query_stats = defaultdict(lambda: {
-        'videos': [],
-        'total_views': 0,
-        'total_engagement': 0,
-        'engagement_rates': [],
-        'follower_counts': [],
-        'video_durations': []
-    })
+    # One date stamp for every report file, even if the run crosses midnight
+    run_date = datetime.now().strftime("%Y%m%d")
     
-    # Process all JSON files
-    json_files = [f for f in os.listdir(APIFY_DIR) if f.endswith('.json') and f.startswith('tiktok_')]
+    # One shared, cached parse of the downloads; the top performers report reads the same columns.
+    # Follower/duration sums and each query's best video were already reduced while parsing
+    columns, query_totals, errors = load_video_columns(APIFY_DIR)
+    for json_file, error in errors:
+        print(f"⚠️  Error processing {json_file}: {error}")
     
-    for json_file in sorted(json_files):
-        # Extract search query
-        search_query = json_file[7:]  # Remove 'tiktok_'
-        search_query = '_'.join(search_query.split('_')[:-2])  # Remove timestamp
-        search_query_display = search_query.replace('_', ' ')
-        
-        json_path = os.path.join(APIFY_DIR, json_file)
-        try:
-            with open(json_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            if isinstance(data, list):
-                for video_data in data:
-                    views = video_data.get('playCount', 0)
-                    likes = video_data.get('diggCount', 0)
-                    comments = video_data.get('commentCount', 0)
-                    shares = video_data.get('shareCount', 0)
-                    engagement = likes + comments + shares
-                    
-                    engagement_rate = (engagement / views * 100) if views > 0 else 0
-                    
-                    query_stats[search_query_display]['videos'].append({
-                        'id': video_data.get('id', ''),
-                        'caption': video_data.get('text', '')[:100],
-                        'creator': video_data.get('authorMeta', {}).get('name', ''),
-                        'views': views,
-                        'engagement': engagement,
-                        'engagement_rate': engagement_rate
-                    })
-                    
-                    query_stats[search_query_display]['total_views'] += views
-                    query_stats[search_query_display]['total_engagement'] += engagement
-                    query_stats[search_query_display]['engagement_rates'].append(engagement_rate)
-                    query_stats[search_query_display]['follower_counts'].append(
-                        video_data.get('authorMeta', {}).get('fans', 0)
-                    )
-                    query_stats[search_query_display]['video_durations'].append(
-                        video_data.get('videoMeta', {}).get('duration', 0)
-                    )
-        
-        except Exception as e:
-            print(f"⚠️  Error processing {json_file}: {e}")
-    
-    # Calculate summary stats for each query
-    query_summary = []
-    for query, stats in query_stats.items():
-        video_count = len(stats['videos'])
-        if video_count > 0:
-            # Calculate averages and medians
-            avg_views = stats['total_views'] / video_count
-            avg_engagement = stats['total_engagement'] / video_count
-            avg_engagement_rate = statistics.mean(stats['engagement_rates'])
-            median_engagement_rate = statistics.median(stats['engagement_rates'])
-            
-            # Find best performing video
-            best_video = max(stats['videos'], key=lambda x: x['engagement_rate'])
-            
-            # High performer count (>10% engagement)
-            high_performers = len([v for v in stats['videos'] if v['engagement_rate'] > 10])
-            
-            # Average creator size
-            avg_creator_followers = statistics.mean(stats['follower_counts']) if stats['follower_counts'] else 0
-            
-            # Average video duration
-            avg_duration = statistics.mean(stats['video_durations']) if stats['video_durations'] else 0
-            
-            query_summary.append({
-                'search_query': query,
-                'video_count': video_count,
-                'total_views': stats['total_views'],
-                'total_engagement': stats['total_engagement'],
-                'avg_views': avg_views,
-                'avg_engagement': avg_engagement,
-                'avg_engagement_rate': avg_engagement_rate,
-                'median_engagement_rate': median_engagement_rate,
-                'high_performers': high_performers,
-                'high_performer_pct': (high_performers / video_count * 100),
-                'avg_creator_followers': avg_creator_followers,
-                'avg_video_duration': avg_duration,
-                'best_video_creator': best_video['creator'],
-                'best_video_engagement': best_video['engagement_rate'],
-                'best_video_caption': best_video['caption']
-            })
+    # Only the columns the per-query rates need - captions and creators stay out of the frame
+    videos_df = pd.DataFrame({
+        'search_query': columns['search_query'],
+        'views': columns['views']
+    })
+    videos_df['engagement'] = (pd.Series(columns['likes']) + pd.Series(columns['comments'])
+                               + pd.Series(columns['shares']))
+    views = videos_df['views'].to_numpy(dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        videos_df['engagement_rate'] = np.where(views > 0, videos_df['engagement'] / views * 100, 0.0)
+    videos_df['high_performer'] = videos_df['engagement_rate'] > 10
+    
+    # Calculate summary stats for each query in one grouped pass, in first-seen query order
+    summary_df = videos_df.groupby('search_query', sort=False).agg(
+        video_count=('views', 'size'),
+        total_views=('views', 'sum'),
+        total_engagement=('engagement', 'sum'),
+        avg_engagement_rate=('engagement_rate', 'mean'),
+        median_engagement_rate=('engagement_rate', 'median'),
+        high_performers=('high_performer', 'sum')
+    ).join(pd.DataFrame.from_dict(
+        {query: (totals.total_followers, totals.total_duration,
+                 totals.best_creator, totals.best_rate, totals.best_caption)
+         for query, totals in query_totals.items()},
+        orient='index',
+        columns=['total_followers', 'total_duration',
+                 'best_video_creator', 'best_video_engagement', 'best_video_caption']
+    ))
+    summary_df['avg_views'] = summary_df['total_views'] / summary_df['video_count']
+    summary_df['avg_engagement'] = summary_df['total_engagement'] / summary_df['video_count']
+    summary_df['high_performer_pct'] = summary_df['high_performers'] / summary_df['video_count'] * 100
+    summary_df['avg_creator_followers'] = summary_df['total_followers'] / summary_df['video_count']
+    summary_df['avg_video_duration'] = summary_df['total_duration'] / summary_df['video_count']
+    
+    query_summary = summary_df.drop(columns=['total_followers', 'total_duration']).reset_index().to_dict('records')
     
     # 1. Full search query analysis
     print("\n📊 Search Query Performance Analysis")
-    full_file = os.path.join(OUTPUT_DIR, f'search_query_analysis_{datetime.now().strftime("%Y%m%d")}.csv')
+    full_file = os.path.join(OUTPUT_DIR, f'search_query_analysis_{run_date}.csv')
     
     fieldnames = ['search_query', 'video_count', 'avg_views', 'avg_engagement_rate', 
                   'median_engagement_rate', 'high_performers', 'high_performer_pct',
                   'avg_creator_followers', 'avg_video_duration']
     
-    with open(full_file, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for query in sorted(query_summary, key=lambda x: x['avg_engagement_rate'], reverse=True):
-            writer.writerow({k: query[k] for k in fieldnames})
+    # Rank once; the best-queries report below reuses the head of this order
+    ranked_queries = sorted(query_summary, key=itemgetter('avg_engagement_rate'), reverse=True)
+    
+    with open_csv_output(full_file) as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(fieldnames)
+        # Rows are tuples pulled by one itemgetter, written in a single writerows call
+        row_values = itemgetter(*fieldnames)
+        writer.writerows(map(row_values, ranked_queries))
     
     print(f"✅ Saved: {full_file}")
     
     # 2. Best queries by engagement
     print("\n⭐ Best Search Queries by Engagement")
-    best_queries = sorted(query_summary, key=lambda x: x['avg_engagement_rate'], reverse=True)[:30]
+    best_queries = ranked_queries[:30]
     
-    best_file = os.path.join(OUTPUT_DIR, f'best_search_queries_{datetime.now().strftime("%Y%m%d")}.csv')
+    best_file = os.path.join(OUTPUT_DIR, f'best_search_queries_{run_date}.csv')
     
     best_fieldnames = ['rank', 'search_query', 'video_count', 'avg_engagement_rate', 
                        'high_performer_pct', 'best_video_creator', 'best_video_engagement', 
                        'best_video_caption']
     
-    with open(best_file, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=best_fieldnames)
-        writer.writeheader()
-        for i, query in enumerate(best_queries, 1):
-            row = {'rank': i}
-            row.update({k: query[k] for k in best_fieldnames[1:]})
-            writer.writerow(row)
+    with open_csv_output(best_file) as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(best_fieldnames)
+        row_values = itemgetter(*best_fieldnames[1:])
+        writer.writerows((i,) + row_values(query) for i, query in enumerate(best_queries, 1))
     
     print(f"✅ Saved: {best_file}")
     
@@ -158,31 +123,37 @@ def main():
         'location': ['home', 'gym', 'outdoor'],
         'program': ['program', 'plan', 'routine', 'split', 'workout']
     }
+    # One compiled alternation per category - a single scan of the query instead of one per keyword
+    category_patterns = {
+        category: re.compile('|'.join(map(re.escape, keywords)))
+        for category, keywords in categories.items()
+    }
     
-    category_stats = defaultdict(lambda: {'queries': [], 'total_videos': 0, 'total_engagement_rate': 0})
+    category_stats = defaultdict(CategoryStats)
     
     for query in query_summary:
         query_lower = query['search_query'].lower()
-        for category, keywords in categories.items():
-            if any(keyword in query_lower for keyword in keywords):
-                category_stats[category]['queries'].append(query['search_query'])
-                category_stats[category]['total_videos'] += query['video_count']
-                category_stats[category]['total_engagement_rate'] += query['avg_engagement_rate']
+        for category, pattern in category_patterns.items():
+            if pattern.search(query_lower):
+                stats = category_stats[category]
+                stats.queries.append(query['search_query'])
+                stats.total_videos += query['video_count']
+                stats.total_engagement_rate += query['avg_engagement_rate']
     
-    category_file = os.path.join(OUTPUT_DIR, f'query_category_analysis_{datetime.now().strftime("%Y%m%d")}.csv')
+    category_file = os.path.join(OUTPUT_DIR, f'query_category_analysis_{run_date}.csv')
     
     with open(category_file, 'w', newline='', encoding='utf-8') as csvfile:
         writer = csv.writer(csvfile)
         writer.writerow(['category', 'query_count', 'total_videos', 'avg_engagement_rate', 'example_queries'])
         
         for category, stats in category_stats.items():
-            if stats['queries']:
-                avg_rate = stats['total_engagement_rate'] / len(stats['queries'])
-                examples = ', '.join(stats['queries'][:3])
+            if stats.queries:
+                avg_rate = stats.total_engagement_rate / len(stats.queries)
+                examples = ', '.join(stats.queries[:3])
                 writer.writerow([
                     category,
-                    len(stats['queries']),
-                    stats['total_videos'],
+                    len(stats.queries),
+                    stats.total_videos,
                     f"{avg_rate:.2f}%",
                     examples
                 ])
@@ -202,9 +173,9 @@ def main():
     
     print("\n📊 Category Performance:")
     for category, stats in category_stats.items():
-        if stats['queries']:
-            avg_rate = stats['total_engagement_rate'] / len(stats['queries'])
-            print(f"   {category.capitalize()}: {avg_rate:.1f}% avg engagement across {len(stats['queries'])} queries")
+        if stats.queries:
+            avg_rate = stats.total_engagement_rate / len(stats.queries)
+            print(f"   {category.capitalize()}: {avg_rate:.1f}% avg engagement across {len(stats.queries)} queries")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
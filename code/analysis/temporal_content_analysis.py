@@ -7,48 +7,74 @@ import numpy as np
 import os
 from datetime import datetime, timedelta
 
+from utils import MEN_PATTERN, WOMEN_PATTERN, read_csv
+
 # Load the refined dataset
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 EXPORTS_DIR = os.path.join(BASE_DIR, "exports")
 
+USECOLS = ['create_time', 'engagement_rate', 'search_query', 'caption', 'creator_username']
+DTYPES = {'engagement_rate': 'float64', 'search_query': 'category', 'creator_username': 'category'}
+
 print("⏰ Temporal Content Analysis: Established vs Emerging")
-df = pd.read_csv(os.path.join(EXPORTS_DIR, 'tiktok_videos_refined_20250803.csv'))
+df = read_csv(os.path.join(EXPORTS_DIR, 'tiktok_videos_refined_20250803.csv'), usecols=USECOLS, dtype=DTYPES)
 
 # Convert create_time to datetime
-df['created_date'] = pd.to_datetime(df['create_time']).dt.tz_localize(None)  # Remove timezone info
+# Apify timestamps are ISO 8601, so name the format and skip per-value format inference.
+# Parse as UTC, then drop the zone - mixed offsets land on one clock instead of failing to parse
+df['created_date'] = pd.to_datetime(df['create_time'], format='ISO8601', utc=True).dt.tz_convert(None)
 now = datetime.now()
 df['content_age_days'] = (now - df['created_date']).dt.days
 
-# Define content categories
+# Define content categories - one age bucket per row, partitioned in a single groupby
 cutoff_date = now - timedelta(days=180)  # 6 months ago
-established_content = df[df['created_date'] < cutoff_date].copy()
-emerging_content = df[df['created_date'] >= cutoff_date].copy()
+period = pd.Series(np.where(df['created_date'] < cutoff_date, 'established', 'emerging'), index=df.index)
+period = period.where(df['created_date'].notna())  # Undated rows belong to neither period
+
+by_period = df.groupby(period)
+period_groups = dict(list(by_period))
+established_content = period_groups.get('established', df.iloc[0:0])
+emerging_content = period_groups.get('emerging', df.iloc[0:0])
+period_stats = by_period.agg(
+    avg_age=('content_age_days', 'mean'),
+    avg_engagement=('engagement_rate', 'mean'),
+    median_engagement=('engagement_rate', 'median'),
+).reindex(['established', 'emerging'])
 
 print(f"📊 Content Age Split:")
 print(f"   Established content (>6 months): {len(established_content):,} videos")
 print(f"   Emerging content (<6 months): {len(emerging_content):,} videos")
-print(f"   Average age of established: {established_content['content_age_days'].mean():.0f} days")
-print(f"   Average age of emerging: {emerging_content['content_age_days'].mean():.0f} days")
+print(f"   Average age of established: {period_stats.at['established', 'avg_age']:.0f} days")
+print(f"   Average age of emerging: {period_stats.at['emerging', 'avg_age']:.0f} days")
 
 # Compare engagement patterns
 print(f"\n📈 Engagement Patterns by Content Age:")
-print(f"   Established content average engagement: {established_content['engagement_rate'].mean():.2f}%")
-print(f"   Emerging content average engagement: {emerging_content['engagement_rate'].mean():.2f}%")
-print(f"   Established content median engagement: {established_content['engagement_rate'].median():.2f}%")
-print(f"   Emerging content median engagement: {emerging_content['engagement_rate'].median():.2f}%")
+print(f"   Established content average engagement: {period_stats.at['established', 'avg_engagement']:.2f}%")
+print(f"   Emerging content average engagement: {period_stats.at['emerging', 'avg_engagement']:.2f}%")
+print(f"   Established content median engagement: {period_stats.at['established', 'median_engagement']:.2f}%")
+print(f"   Emerging content median engagement: {period_stats.at['emerging', 'median_engagement']:.2f}%")
 
 # Check our key claims with temporal awareness
 print(f"\n🔍 Re-validating Key Claims with Temporal Control:")
 
 # Claim 1: Women's content drives higher engagement
 print(f"\n1. Gender Performance Gap (Temporal Analysis):")
+print("   Gender terms are matched as whole words, so 'women' no longer counts as men's content")
+print("   and counts are lower than in earlier reports, which matched substrings")
+
+def mentions_any(queries, pattern):
+    """Mask of rows whose search query matches a gender pattern"""
+    # Only the distinct queries (the categories) are matched, not every row
+    matching = [query for query in queries.cat.categories if pattern.search(query)]
+    return queries.isin(matching)
+
+# Classify the whole dataset once; each period selects its rows from these masks
+WOMEN_MASK = mentions_any(df['search_query'], WOMEN_PATTERN)
+MEN_MASK = mentions_any(df['search_query'], MEN_PATTERN)
 
 def analyze_gender_performance(data, label):
-    women_indicators = ['women', 'female', 'girl', 'mom', 'mama']
-    men_indicators = ['men', 'male', 'guy', 'dad', 'father']
-    
-    women_content = data[data['search_query'].str.contains('|'.join(women_indicators), case=False, na=False)]
-    men_content = data[data['search_query'].str.contains('|'.join(men_indicators), case=False, na=False)]
+    women_content = data[WOMEN_MASK.loc[data.index]]
+    men_content = data[MEN_MASK.loc[data.index]]
     
     print(f"   {label}:")
     print(f"     Women's content: {len(women_content)} videos, {women_content['engagement_rate'].mean():.2f}% avg engagement")
@@ -64,18 +90,31 @@ analyze_gender_performance(emerging_content, "Emerging Content")
 # Claim 2: Program type performance
 print(f"\n2. Program Type Performance (Temporal Analysis):")
 
+PROGRAM_KEYWORDS = {
+    'yoga': ['yoga', 'pilates'],
+    'strength': ['strength', 'lifting', 'weights'],
+    'cardio': ['cardio', 'running', 'treadmill'],
+    'hybrid': ['hybrid'],
+    'core': ['core', 'abs']
+}
+def program_masks(queries):
+    """Per-program row masks, matching each distinct search query once"""
+    # Keywords are plain lowercase words, so lowercase the queries once and use literal substring search
+    distinct = pd.Series(queries.cat.categories, dtype=object)
+    distinct_lower = distinct.str.lower()
+    masks = {}
+    for program, keywords in PROGRAM_KEYWORDS.items():
+        matched = np.logical_or.reduce([distinct_lower.str.contains(keyword, regex=False) for keyword in keywords])
+        masks[program] = queries.isin(distinct[matched])
+    return masks
+
+# Classify the whole dataset once; each period selects its rows from these masks
+PROGRAM_MASKS = program_masks(df['search_query'])
+
 def analyze_program_types(data, label):
-    program_keywords = {
-        'yoga': ['yoga', 'pilates'],
-        'strength': ['strength', 'lifting', 'weights'],
-        'cardio': ['cardio', 'running', 'treadmill'],
-        'hybrid': ['hybrid'],
-        'core': ['core', 'abs']
-    }
-    
     print(f"   {label}:")
-    for program, keywords in program_keywords.items():
-        program_content = data[data['search_query'].str.contains('|'.join(keywords), case=False, na=False)]
+    for program, mask in PROGRAM_MASKS.items():
+        program_content = data[mask.loc[data.index]]
         if len(program_content) > 0:
             print(f"     {program.title()}: {len(program_content)} videos, {program_content['engagement_rate'].mean():.2f}% avg")
 
@@ -84,11 +123,13 @@ analyze_program_types(emerging_content, "Emerging Content")
 
 # Look for emerging trends
 print(f"\n🌊 Emerging Trends (Recent 6 months):")
-recent_top_queries = emerging_content['search_query'].value_counts().head(10)
+# Count as plain values: categorical counts would list unused queries and order ties alphabetically
+recent_top_queries = emerging_content['search_query'].astype(object).value_counts().head(10)
+# Per-query averages in one grouped pass, then looked up by query
+recent_query_engagement = emerging_content.groupby('search_query', observed=True)['engagement_rate'].mean()
 print(f"   Top 10 search queries in recent content:")
 for query, count in recent_top_queries.items():
-    query_data = emerging_content[emerging_content['search_query'] == query]
-    avg_engagement = query_data['engagement_rate'].mean()
+    avg_engagement = recent_query_engagement[query]
     print(f"     '{query}': {count} videos, {avg_engagement:.2f}% avg engagement")
 
 # High-performing emerging content
@@ -97,38 +138,61 @@ emerging_winners = emerging_content[emerging_content['engagement_rate'] > 10].co
 if len(emerging_winners) > 0:
     print(f"   Found {len(emerging_winners)} high-performing recent videos:")
     top_emerging = emerging_winners.nlargest(10, 'engagement_rate')
-    for idx, row in top_emerging.iterrows():
-        caption_preview = str(row['caption'])[:50] + "..." if len(str(row['caption'])) > 50 else str(row['caption'])
-        age_days = row['content_age_days']
-        print(f"     {row['engagement_rate']:.1f}% - @{row['creator_username']} ({age_days} days old) - {caption_preview}")
+    # Build the caption previews column-wise, then walk plain row tuples
+    captions = top_emerging['caption'].map(str)
+    top_emerging = top_emerging.assign(
+        caption_preview=captions.str.slice(0, 50).where(captions.str.len() <= 50, captions.str.slice(0, 50) + "...")
+    )
+    for row in top_emerging.itertuples(index=False):
+        print(f"     {row.engagement_rate:.1f}% - @{row.creator_username} ({row.content_age_days} days old) - {row.caption_preview}")
 
 # Creator consistency across time periods
 print(f"\n👤 Creator Performance: Established vs Emerging:")
 creators_in_both = set(established_content['creator_username']) & set(emerging_content['creator_username'])
 print(f"   Creators with content in both periods: {len(creators_in_both)}")
 
-consistent_performers = []
-for creator in list(creators_in_both)[:10]:  # Sample first 10
-    est_perf = established_content[established_content['creator_username'] == creator]['engagement_rate'].mean()
-    emer_perf = emerging_content[emerging_content['creator_username'] == creator]['engagement_rate'].mean()
-    est_count = len(established_content[established_content['creator_username'] == creator])
-    emer_count = len(emerging_content[emerging_content['creator_username'] == creator])
-    
-    if est_count >= 2 and emer_count >= 2:  # At least 2 videos in each period
-        consistent_performers.append({
-            'creator': creator,
-            'established_avg': est_perf,
-            'emerging_avg': emer_perf,
-            'difference': emer_perf - est_perf,
-            'est_count': est_count,
-            'emer_count': emer_count
-        })
+def trend_arrow(difference):
+    """Arrow for a change in average engagement of more than one point"""
+    return "↗️" if difference > 1 else "↘️" if difference < -1 else "➡️"
+
+# Per-creator mean and count for each period in one grouped pass, one row per creator
+creator_period_stats = (
+    df.groupby(['creator_username', period.rename('period')], observed=True)['engagement_rate']
+    .agg(avg='mean', count='size')
+    .unstack('period')
+    .reindex(columns=pd.MultiIndex.from_product([['avg', 'count'], ['established', 'emerging']]))
+)
+
+sample_stats = creator_period_stats.reindex(list(creators_in_both)[:10])  # Sample first 10
+# At least 2 videos in each period
+sample_stats = sample_stats[(sample_stats[('count', 'established')] >= 2) & (sample_stats[('count', 'emerging')] >= 2)]
+differences = sample_stats[('avg', 'emerging')] - sample_stats[('avg', 'established')]
+
+consistent_performers = [
+    {
+        'creator': creator,
+        'established_avg': est_perf,
+        'emerging_avg': emer_perf,
+        'difference': difference,
+        'est_count': int(est_count),
+        'emer_count': int(emer_count)
+    }
+    for creator, est_perf, emer_perf, difference, est_count, emer_count in zip(
+        sample_stats.index,
+        sample_stats[('avg', 'established')],
+        sample_stats[('avg', 'emerging')],
+        differences,
+        sample_stats[('count', 'established')],
+        sample_stats[('count', 'emerging')]
+    )
+]
 
 if consistent_performers:
     print(f"   Creator performance changes (sample):")
-    for perf in consistent_performers:
-        trend = "↗️" if perf['difference'] > 1 else "↘️" if perf['difference'] < -1 else "➡️"
-        print(f"     @{perf['creator']}: {perf['established_avg']:.1f}% → {perf['emerging_avg']:.1f}% {trend}")
+    print("\n".join(
+        f"     @{perf['creator']}: {perf['established_avg']:.1f}% → {perf['emerging_avg']:.1f}% {trend_arrow(perf['difference'])}"
+        for perf in consistent_performers
+    ))
 
 print(f"\n💡 Key Insights:")
 print(f"   1. Temporal splits show different engagement patterns for established vs emerging content")
@@ -3,156 +3,186 @@
 Generate top performers report with detailed engagement analysis
 """
 import os
-import json
 import csv
+from dataclasses import dataclass
+from operator import attrgetter
 from datetime import datetime
 from collections import defaultdict
 
+import numpy as np
+
+from utils import load_video_columns, open_csv_output
+
 # Directories
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 APIFY_DIR = os.path.join(BASE_DIR, "apify_downloads")
 OUTPUT_DIR = os.path.join(BASE_DIR, "exports")
 
-def calculate_metrics(video_data):
-    """Calculate various engagement metrics"""
-    likes = video_data.get('diggCount', 0)
-    comments = video_data.get('commentCount', 0)
-    shares = video_data.get('shareCount', 0)
-    views = video_data.get('playCount', 1)
-    
-    engagement_rate = ((likes + comments + shares) / views * 100) if views > 0 else 0
-    viral_score = (shares / views * 100) if views > 0 else 0
-    comment_rate = (comments / views * 100) if views > 0 else 0
-    
-    return {
-        'engagement_rate': engagement_rate,
-        'viral_score': viral_score,
-        'comment_rate': comment_rate,
-        'total_engagement': likes + comments + shares
-    }
+@dataclass(slots=True)
+class VideoInfo:
+    """One video's report fields - slotted, so no per-record attribute dict"""
+    video_id: str
+    caption: str
+    creator: str
+    creator_followers: int
+    search_query: str
+    views: int
+    likes: int
+    comments: int
+    shares: int
+    engagement_rate: float
+    viral_score: float
+    comment_rate: float
+    total_engagement: int
+    duration: int
+    create_date: str
+    url: str
+    query_video_count: int = 0  # Filled in for the per-query best videos
+
+def calculate_metrics(views, likes, comments, shares):
+    """Calculate various engagement metrics for whole count arrays at once"""
+    total_engagement = likes + comments + shares
+    has_views = views > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'engagement_rate': np.where(has_views, total_engagement / views * 100, 0),
+            'viral_score': np.where(has_views, shares / views * 100, 0),
+            'comment_rate': np.where(has_views, comments / views * 100, 0),
+            'total_engagement': total_engagement
+        }
+
+def top_indices(values, k):
+    """Indices of the k largest values, highest first, ties in input order like sorted()
+
+    argpartition finds the k-th largest value in linear time; only the values at
+    or above it are then sorted.
+    """
+    if len(values) <= k:
+        candidates = np.arange(len(values))
+    else:
+        threshold = values[np.argpartition(-values, k - 1)[k - 1]]
+        candidates = np.flatnonzero(values >= threshold)
+    return candidates[np.lexsort((candidates, -values[candidates]))][:k]
 
 def main():
     print("🏆 Generating Top Performers Report...")
     
-    all_videos = []
-    
-    # Process all JSON files
-    json_files = [f for f in os.listdir(APIFY_DIR) if f.endswith('.json') and f.startswith('tiktok_')]
-    
-    for json_file in sorted(json_files):
-        # Extract search query
-        search_query = json_file[7:]  # Remove 'tiktok_'
-        search_query = '_'.join(search_query.split('_')[:-2])  # Remove timestamp
-        search_query = search_query.replace('_', ' ')
-        
-        json_path = os.path.join(APIFY_DIR, json_file)
-        try:
-            with open(json_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
-            if isinstance(data, list):
-                for video_data in data:
-                    if video_data.get('playCount', 0) > 1000:  # Filter for videos with decent views
-                        metrics = calculate_metrics(video_data)
-                        
-                        video_info = {
-                            'video_id': video_data.get('id', ''),
-                            'caption': video_data.get('text', '')[:100],  # First 100 chars
-                            'creator': video_data.get('authorMeta', {}).get('name', ''),
-                            'creator_followers': video_data.get('authorMeta', {}).get('fans', 0),
-                            'search_query': search_query,
-                            'views': video_data.get('playCount', 0),
-                            'likes': video_data.get('diggCount', 0),
-                            'comments': video_data.get('commentCount', 0),
-                            'shares': video_data.get('shareCount', 0),
-                            'engagement_rate': metrics['engagement_rate'],
-                            'viral_score': metrics['viral_score'],
-                            'comment_rate': metrics['comment_rate'],
-                            'total_engagement': metrics['total_engagement'],
-                            'duration': video_data.get('videoMeta', {}).get('duration', 0),
-                            'create_date': video_data.get('createTimeISO', '')[:10],
-                            'url': video_data.get('webVideoUrl', '')
-                        }
-                        all_videos.append(video_info)
-        
-        except Exception as e:
-            print(f"⚠️  Error processing {json_file}: {e}")
+    # One date stamp for every report file, even if the run crosses midnight
+    run_date = datetime.now().strftime("%Y%m%d")
+    
+    # One shared, cached parse of the downloads; the search query analysis reads the same columns
+    columns, _, errors = load_video_columns(APIFY_DIR)
+    for json_file, error in errors:
+        print(f"⚠️  Error processing {json_file}: {error}")
+    
+    # Filter for videos with decent views; kept holds their positions in the shared columns
+    kept = np.flatnonzero(np.asarray(columns['views'], dtype=np.int64) > 1000)
+    views = np.asarray(columns['views'], dtype=np.int64)[kept]
+    likes = np.asarray(columns['likes'], dtype=np.int64)[kept]
+    comments = np.asarray(columns['comments'], dtype=np.int64)[kept]
+    shares = np.asarray(columns['shares'], dtype=np.int64)[kept]
+    kept = kept.tolist()
+    metrics = calculate_metrics(views, likes, comments, shares)
+    engagement_rates = metrics['engagement_rate'].tolist()
+    viral_scores = metrics['viral_score'].tolist()
+    comment_rates = metrics['comment_rate'].tolist()
+    total_engagement = metrics['total_engagement'].tolist()
+    
+    def video_at(i):
+        """Full report record for the i-th kept video, built only for videos that are emitted"""
+        j = kept[i]
+        return VideoInfo(
+            video_id=columns['video_id'][j],
+            caption=columns['caption'][j],
+            creator=columns['creator'][j],
+            creator_followers=columns['creator_followers'][j],
+            search_query=columns['search_query'][j],
+            views=columns['views'][j],
+            likes=columns['likes'][j],
+            comments=columns['comments'][j],
+            shares=columns['shares'][j],
+            engagement_rate=engagement_rates[i],
+            viral_score=viral_scores[i],
+            comment_rate=comment_rates[i],
+            total_engagement=total_engagement[i],
+            duration=columns['duration'][j],
+            create_date=columns['create_date'][j],
+            url=columns['url'][j]
+        )
     
     # Generate multiple reports
     
     # 1. Top 100 by engagement rate
     print("\n📊 Top Videos by Engagement Rate")
-    by_engagement = sorted(all_videos, key=lambda x: x['engagement_rate'], reverse=True)[:100]
+    by_engagement = [video_at(i) for i in top_indices(metrics['engagement_rate'], 100)]
     
-    engagement_file = os.path.join(OUTPUT_DIR, f'top_100_engagement_rate_{datetime.now().strftime("%Y%m%d")}.csv')
+    engagement_file = os.path.join(OUTPUT_DIR, f'top_100_engagement_rate_{run_date}.csv')
     fieldnames = ['rank', 'creator', 'caption', 'engagement_rate', 'views', 'likes', 'comments', 'shares', 
                   'search_query', 'create_date', 'url']
     
-    with open(engagement_file, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for i, video in enumerate(by_engagement, 1):
-            row = {'rank': i}
-            row.update({k: video[k] for k in fieldnames[1:]})
-            writer.writerow(row)
+    with open_csv_output(engagement_file) as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(fieldnames)
+        # Rows are tuples pulled by one attrgetter, written in a single writerows call
+        row_values = attrgetter(*fieldnames[1:])
+        writer.writerows((i,) + row_values(video) for i, video in enumerate(by_engagement, 1))
     
     print(f"✅ Saved: {engagement_file}")
     
     # 2. Top 100 by viral score (share rate)
     print("\n🚀 Top Videos by Viral Score")
-    by_viral = sorted(all_videos, key=lambda x: x['viral_score'], reverse=True)[:100]
+    by_viral = [video_at(i) for i in top_indices(metrics['viral_score'], 100)]
     
-    viral_file = os.path.join(OUTPUT_DIR, f'top_100_viral_score_{datetime.now().strftime("%Y%m%d")}.csv')
+    viral_file = os.path.join(OUTPUT_DIR, f'top_100_viral_score_{run_date}.csv')
     fieldnames = ['rank', 'creator', 'caption', 'viral_score', 'shares', 'views', 'engagement_rate', 
                   'search_query', 'create_date', 'url']
     
-    with open(viral_file, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for i, video in enumerate(by_viral, 1):
-            row = {'rank': i}
-            row.update({k: video[k] for k in fieldnames[1:]})
-            writer.writerow(row)
+    with open_csv_output(viral_file) as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(fieldnames)
+        row_values = attrgetter(*fieldnames[1:])
+        writer.writerows((i,) + row_values(video) for i, video in enumerate(by_viral, 1))
     
     print(f"✅ Saved: {viral_file}")
     
     # 3. Top videos by search query
     print("\n🔍 Best Videos per Search Query")
     by_query = defaultdict(list)
-    for video in all_videos:
-        by_query[video['search_query']].append(video)
+    search_queries = columns['search_query']
+    for i, j in enumerate(kept):
+        by_query[search_queries[j]].append(i)
     
     query_best = []
-    for query, videos in by_query.items():
-        if videos:
-            best = max(videos, key=lambda x: x['engagement_rate'])
-            best['query_video_count'] = len(videos)
+    for query, indices in by_query.items():
+        if indices:
+            best = video_at(max(indices, key=engagement_rates.__getitem__))
+            best.query_video_count = len(indices)
             query_best.append(best)
     
-    query_file = os.path.join(OUTPUT_DIR, f'best_videos_by_search_{datetime.now().strftime("%Y%m%d")}.csv')
+    query_file = os.path.join(OUTPUT_DIR, f'best_videos_by_search_{run_date}.csv')
     fieldnames = ['search_query', 'query_video_count', 'creator', 'caption', 'engagement_rate', 
                   'views', 'likes', 'url']
     
-    with open(query_file, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for video in sorted(query_best, key=lambda x: x['engagement_rate'], reverse=True):
-            writer.writerow({k: video[k] for k in fieldnames})
+    with open_csv_output(query_file) as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(fieldnames)
+        row_values = attrgetter(*fieldnames)
+        writer.writerows(map(row_values, sorted(query_best, key=attrgetter('engagement_rate'), reverse=True)))
     
     print(f"✅ Saved: {query_file}")
     
-    # 4. Summary statistics
+    # 4. Summary statistics, reduced over the metric arrays
     print("\n📈 Summary Statistics:")
-    print(f"   Total videos analyzed: {len(all_videos):,}")
-    print(f"   Average engagement rate: {sum(v['engagement_rate'] for v in all_videos) / len(all_videos):.2f}%")
-    print(f"   Average views: {sum(v['views'] for v in all_videos) / len(all_videos):,.0f}")
-    print(f"   Videos with >10% engagement: {len([v for v in all_videos if v['engagement_rate'] > 10]):,}")
-    print(f"   Videos with >1M views: {len([v for v in all_videos if v['views'] > 1000000]):,}")
+    print(f"   Total videos analyzed: {len(views):,}")
+    print(f"   Average engagement rate: {metrics['engagement_rate'].mean():.2f}%")
+    print(f"   Average views: {views.mean():,.0f}")
+    print(f"   Videos with >10% engagement: {int((metrics['engagement_rate'] > 10).sum()):,}")
+    print(f"   Videos with >1M views: {int((views > 1000000).sum()):,}")
     
     # Print top 5 for quick reference
     print("\n🌟 Top 5 Videos by Engagement:")
     for i, video in enumerate(by_engagement[:5], 1):
-        print(f"   {i}. {video['creator']} ({video['engagement_rate']:.1f}%) - {video['caption'][:50]}...")
+        print(f"   {i}. {video.creator} ({video.engagement_rate:.1f}%) - {video.caption[:50]}...")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
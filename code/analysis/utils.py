@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Shared helpers for the TikTok analysis scripts
+"""
+import gzip
+import hashlib
+import io
+import json
+import os
+import pickle
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # orjson is optional - fall back to the stdlib parser
+    orjson = None
+
+try:
+    import ijson
+except ImportError:  # ijson is optional - fall back to loading whole files
+    ijson = None
+
+try:
+    from pyarrow import feather
+    CSV_ENGINE = 'pyarrow'
+    CACHE_FORMAT = 'feather'
+except ImportError:  # pyarrow is optional - fall back to pandas' C parser and pickle caches
+    CSV_ENGINE = 'c'
+    CACHE_FORMAT = 'pkl'
+
+# Whole-word gender terms, plurals listed explicitly, so 'women', 'menopause' or 'mental'
+# don't count as men's content. The engagement clusters keep their substring categories
+WOMEN_PATTERN = re.compile(r'\b(?:women|woman|females?|girls?|moms?|mamas?)\b', re.IGNORECASE)
+MEN_PATTERN = re.compile(r'\b(?:men|man|males?|guys?|dads?|fathers?)\b', re.IGNORECASE)
+
+def load_json(path):
+    """Load a JSON file, using orjson's faster parser when it is installed"""
+    if orjson is not None:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def query_from_filename(json_file):
+    """Search query encoded in an Apify file name: tiktok_<query>_<date>_<time>.json
+
+    One right split drops the two timestamp fields; names without them give ''.
+    """
+    parts = json_file[7:].rsplit('_', 2)
+    return parts[0] if len(parts) == 3 else ''
+
+def open_csv_output(path, buffer_size=1 << 20):
+    """Open a UTF-8 text file for csv.writer over a 1 MiB write buffer
+
+    Rows are flushed to disk in large blocks instead of one small write per row.
+    """
+    return io.TextIOWrapper(open(path, 'wb', buffering=buffer_size), encoding='utf-8', newline='')
+
+# Per-video fields shared by the Apify report scripts, in column order
+VIDEO_COLUMNS = ('search_query', 'video_id', 'caption', 'creator', 'creator_followers',
+                 'views', 'likes', 'comments', 'shares', 'duration', 'create_date', 'url')
+# Part of the video cache key - bump whenever _parse_video_file or QueryTotals changes
+VIDEO_PARSER_VERSION = 3
+
+@dataclass(slots=True)
+class QueryTotals:
+    """Running follower and duration sums and the best video so far for one search query"""
+    total_followers: int = 0
+    total_duration: int = 0
+    best_rate: float = -1.0
+    best_creator: str = ''
+    best_caption: str = ''
+
+def _parse_video_file(json_path, search_query):
+    """Parse one Apify file into per-video column lists and its running totals, returning (columns, totals, error)
+
+    Follower counts and durations are only ever averaged, and only the best
+    video (first of equal rates) is reported per query, so both are reduced
+    here while parsing.
+    """
+    columns = {column: [] for column in VIDEO_COLUMNS}
+    totals = QueryTotals()
+    try:
+        for video_data in iter_json_list(json_path):
+            author_meta = video_data.get('authorMeta', {})
+            # Null counts are treated as zero rather than failing the whole file
+            row = (
+                search_query,
+                video_data.get('id', ''),
+                video_data.get('text', '')[:100],  # First 100 chars
+                author_meta.get('name', ''),
+                author_meta.get('fans', 0) or 0,
+                video_data.get('playCount', 0) or 0,
+                video_data.get('diggCount', 0) or 0,
+                video_data.get('commentCount', 0) or 0,
+                video_data.get('shareCount', 0) or 0,
+                video_data.get('videoMeta', {}).get('duration', 0) or 0,
+                video_data.get('createTimeISO', '')[:10],
+                video_data.get('webVideoUrl', '')
+            )
+            for column, value in zip(VIDEO_COLUMNS, row):
+                columns[column].append(value)
+            
+            _, _, caption, creator, followers, views, likes, comments, shares, duration, _, _ = row
+            totals.total_followers += followers
+            totals.total_duration += duration
+            engagement_rate = ((likes + comments + shares) / views * 100) if views > 0 else 0.0
+            if engagement_rate > totals.best_rate:
+                totals.best_rate, totals.best_creator, totals.best_caption = engagement_rate, creator, caption
+    except ValueError as e:  # Malformed JSON - the file contributes no videos, streamed or not
+        return {column: [] for column in VIDEO_COLUMNS}, QueryTotals(), str(e)
+    except Exception as e:
+        return columns, totals, str(e)
+    return columns, totals, None
+
+def load_video_columns(apify_dir, use_cache=True):
+    """Parse every tiktok_*.json download into one set of per-video columns
+
+    Returns (columns, query_totals, errors): a dict of lists keyed by
+    VIDEO_COLUMNS, in sorted file order; a QueryTotals per search query, in
+    first-seen order; and (json_file, message) pairs for files that failed
+    part-way. Files are parsed in worker processes. The result is cached as a
+    gzipped pickle in a .cache directory and reused while the parser version and
+    every file's name, size and mtime are unchanged, so the report scripts share
+    one parse between them.
+    """
+    with os.scandir(apify_dir) as entries:
+        json_entries = sorted((entry.name, entry.path, entry.stat()) for entry in entries
+                              if entry.name.startswith('tiktok_') and entry.name.endswith('.json') and entry.is_file())
+    fingerprint = (VIDEO_PARSER_VERSION, [(name, stat.st_size, stat.st_mtime_ns) for name, _, stat in json_entries])
+    cache_path = os.path.join(apify_dir, '.cache', 'video_columns.pkl.gz')
+
+    if use_cache and os.path.exists(cache_path):
+        try:
+            with gzip.open(cache_path, 'rb') as f:
+                cached_fingerprint, columns, query_totals, errors = pickle.load(f)
+            if cached_fingerprint == fingerprint:
+                return columns, query_totals, errors
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):  # Unreadable cache - parse again
+            pass
+
+    columns = {column: [] for column in VIDEO_COLUMNS}
+    query_totals = {}
+    errors = []
+    json_files = [name for name, _, _ in json_entries]
+    json_paths = [path for _, path, _ in json_entries]
+    search_queries = [query_from_filename(name).replace('_', ' ') for name in json_files]
+    with ProcessPoolExecutor() as executor:
+        results = executor.map(_parse_video_file, json_paths, search_queries, chunksize=8)
+        for json_file, search_query, (file_columns, totals, error) in zip(json_files, search_queries, results):
+            for column in VIDEO_COLUMNS:
+                columns[column].extend(file_columns[column])
+            if file_columns['views']:
+                stats = query_totals.setdefault(search_query, QueryTotals())
+                stats.total_followers += totals.total_followers
+                stats.total_duration += totals.total_duration
+                # Strictly greater, so the earliest of equal rates wins as with max()
+                if totals.best_rate > stats.best_rate:
+                    stats.best_rate, stats.best_creator, stats.best_caption = (
+                        totals.best_rate, totals.best_creator, totals.best_caption)
+            if error is not None:
+                errors.append((json_file, error))
+
+    if use_cache:
+        tmp_path = cache_path + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with gzip.open(tmp_path, 'wb', compresslevel=1) as f:
+                pickle.dump((fingerprint, columns, query_totals, errors), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except OSError:  # Unwritable dir - skip the cache
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return columns, query_totals, errors
+
+def iter_json_list(path):
+    """Yield the items of a top-level JSON array, or nothing if the file holds another type
+
+    With ijson the array is streamed one item at a time, so peak memory is one
+    video rather than the whole file. A malformed file raises ValueError on both
+    paths; with ijson that can happen after some items were yielded, so callers
+    should discard the file's items on ValueError to match a whole-file load.
+    """
+    if ijson is not None:
+        with open(path, 'rb') as f:
+            try:
+                yield from ijson.items(f, 'item', use_float=True)
+            except ijson.JSONError as e:
+                raise ValueError(str(e)) from e
+        return
+    data = load_json(path)
+    if isinstance(data, list):
+        yield from data
+
+def with_nullable_ints(df, columns):
+    """Copy of a frame with whole-number float columns cast to nullable Int64
+
+    A single None turns an integer column into floats, which to_csv writes as
+    '370685.0'; Int64 keeps the plain integer text and leaves missing cells empty.
+    """
+    df = df.copy()
+    for column in columns:
+        values = df[column]
+        if values.dtype.kind == 'f' and (values.dropna() % 1 == 0).all():
+            df[column] = values.astype('Int64')
+    return df
+
+def write_parquet_copy(df, csv_path):
+    """Write a zstd-compressed Parquet copy of a frame next to its CSV when pyarrow is installed
+
+    The Parquet file keeps the column dtypes, so loaders can skip re-parsing the
+    CSV text. Returns the path written, or None without pyarrow.
+    """
+    if CACHE_FORMAT != 'feather':
+        return None
+    parquet_path = os.path.splitext(csv_path)[0] + '.parquet'
+    df.to_parquet(parquet_path, index=False, compression='zstd')
+    return parquet_path
+
+def read_csv(path, use_cache=True, **kwargs):
+    """Read a CSV into a DataFrame, using the multithreaded pyarrow parser when it is installed
+
+    Parsed frames are cached in a .cache directory next to the CSV, keyed on the
+    read options, and reused until the CSV is modified again. With pyarrow the
+    cache is uncompressed Arrow Feather, memory-mapped on load so columns are
+    read straight from the page cache without any text decoding.
+    """
+    if not use_cache:
+        return pd.read_csv(path, engine=CSV_ENGINE, **kwargs)
+
+    options_key = hashlib.md5(repr(sorted(kwargs.items())).encode('utf-8')).hexdigest()[:12]
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(path)), '.cache')
+    cache_path = os.path.join(cache_dir, f"{os.path.basename(path)}.{options_key}.{CACHE_FORMAT}")
+
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) > os.path.getmtime(path):
+        if CACHE_FORMAT == 'feather':
+            return feather.read_table(cache_path, memory_map=True).to_pandas()
+        return pd.read_pickle(cache_path)
+
+    df = pd.read_csv(path, engine=CSV_ENGINE, **kwargs)
+    tmp_path = cache_path + '.tmp'
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        if CACHE_FORMAT == 'feather':
+            df.to_feather(tmp_path, compression='uncompressed')
+        else:
+            df.to_pickle(tmp_path)
+        os.replace(tmp_path, cache_path)
+    except (OSError, ValueError, TypeError):  # Unwritable dir or unserializable column - skip the cache
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return df
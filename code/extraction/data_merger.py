@@ -150,6 +150,19 @@ class DataMerger:
             record: Video record dictionary
             csv_file: Path to CSV file
             
+        Returns:
+            True if successful
+        """
+        return self.append_records_to_csv([record], csv_file)
+    
+    def append_records_to_csv(self, records: List[Dict[str, Any]], csv_file: str) -> bool:
+        """
+        Append a batch of records to CSV file with a single open and write.
+        
+        Args:
+            records: List of video record dictionaries
+            csv_file: Path to CSV file
+            
         Returns:
             True if successful
         """
@@ -165,7 +178,7 @@ class DataMerger:
                 if write_headers:
                     writer.writeheader()
                 
-                writer.writerow(record)
+                writer.writerows(records)
             
             return True
             
@@ -266,29 +279,34 @@ class DataMerger:
             self.logger.error(f"Error saving summary to {summary_file}: {e}")
             return False
     
-    def load_existing_csv(self, csv_file: str) -> pd.DataFrame:
+    def load_existing_csv(self, csv_file: str, columns: Optional[List[str]] = None,
+                          dtype: Optional[Dict[str, Any]] = None) -> pd.DataFrame:
         """
         Load existing CSV file as DataFrame.
         
         Args:
             csv_file: CSV filename
+            columns: Optional subset of columns to parse (others are skipped by the reader)
+            dtype: Optional column dtypes, skipping type inference for those columns
             
         Returns:
             DataFrame with existing data
         """
+        empty_columns = columns if columns is not None else self.csv_columns
         try:
             csv_path = self.output_dir / csv_file
             
             if csv_path.exists():
-                df = pd.read_csv(csv_path)
+                usecols = (lambda column: column in columns) if columns is not None else None
+                df = pd.read_csv(csv_path, usecols=usecols, dtype=dtype)
                 self.logger.info(f"Loaded {len(df)} existing records from {csv_file}")
                 return df
             else:
-                return pd.DataFrame(columns=self.csv_columns)
+                return pd.DataFrame(columns=empty_columns)
                 
         except Exception as e:
             self.logger.error(f"Error loading CSV {csv_file}: {e}")
-            return pd.DataFrame(columns=self.csv_columns)
+            return pd.DataFrame(columns=empty_columns)
     
     def get_processed_video_ids(self, csv_file: str) -> set:
         """
@@ -301,9 +319,11 @@ class DataMerger:
             Set of processed video IDs
         """
         try:
-            df = self.load_existing_csv(csv_file)
+            # Read IDs as text: inferring them as numbers costs a pass and turns
+            # them into floats (e.g. '7.2e+18') as soon as one row is blank
+            df = self.load_existing_csv(csv_file, columns=['video_id'], dtype={'video_id': str})
             if 'video_id' in df.columns:
-                return set(df['video_id'].astype(str))
+                return set(df['video_id'].dropna())
             else:
                 return set()
         except Exception as e:
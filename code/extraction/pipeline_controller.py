@@ -286,7 +286,8 @@ class VideoPipelineController:
             True if successful
         """
         try:
-            # Convert results to records and save to CSV
+            # Convert results to records
+            records = []
             for result in results:
                 record = self.data_merger.create_video_record(
                     video_id=result['video_id'],
@@ -301,21 +302,12 @@ class VideoPipelineController:
                 if not is_valid:
                     self.logger.warning(f"Invalid record for {result['video_id']}: {errors}")
                 
-                # Save to CSV
-                self.data_merger.append_to_csv(record, self.output_csv)
-            
-            # Create and save batch summary
-            records = [
-                self.data_merger.create_video_record(
-                    video_id=r['video_id'],
-                    filename=r['filename'],
-                    video_metadata=r['video_metadata'],
-                    ocr_results=r['ocr_results'],
-                    transcription_results=r['transcription_results']
-                )
-                for r in results
-            ]
+                records.append(record)
+            
+            # Save the whole batch to CSV in one write
+            self.data_merger.append_records_to_csv(records, self.output_csv)
             
+            # Create and save batch summary from the same records
             summary = self.data_merger.create_batch_summary(records)
             self.data_merger.save_batch_summary(summary)
             